@@ -0,0 +1,180 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 没装 pyarrow 时退回 NumPy 的 .npz
+    pa = pq = None
+
+# ==========================================
+# 📊 跨赛事统计库 (列式存储)
+# ==========================================
+# 每届杯赛结算后的注单都在 bet_store 的历史局归档里，这里把它们导出成列式文件，
+# 供胜率、ROI、盘口人气这类跨赛事统计使用：
+#   {ANALYTICS_DIR}/{赛事}/r0001.bets.parquet    每注一行: event round player market choice amount won
+#   {ANALYTICS_DIR}/{赛事}/r0001.settle.parquet  每人一行: event round player payout
+# 玩家 / 盘口 / 选项 / 赛事列按字典编码 (整数下标 + 字符串表)。
+# 查询只读需要的列，按赛事、局数筛选时连文件都不打开。
+# 有 pyarrow 就写 Parquet，没有就写 .npz (字典列存成 codes + "列名__dict" 两个数组)，两种文件都能读。
+
+ANALYTICS_DIR = os.environ.get("BET_ANALYTICS_DIR", "bet_analytics")
+CODED = ("event", "player", "market", "choice")  # 按字典编码的列
+DICT_SUFFIX = "__dict"
+
+def event_name(store):
+    """默认赛事名：存档名 + 第一局结算的时间 (如 game_data@2026-10-18_1930)，每届杯赛都用 game_data.json 也不会撞名"""
+    rounds = store.archived_rounds()
+    name = os.path.basename(store.archive.root).rsplit(".", 1)[0]
+    if not rounds: return name
+    return f"{name}@{rounds[0].get('settled_at', '')[:16].replace(' ', '_').replace(':', '')}"
+
+class Analytics:
+    def __init__(self, root=ANALYTICS_DIR):
+        self.root = root
+
+    def _path(self, event, round_no, table, ext):
+        return os.path.join(self.root, event, f"r{round_no:04d}.{table}.{ext}")
+
+    def _exported(self, event, round_no):
+        return any(os.path.exists(self._path(event, round_no, "settle", ext)) for ext in ("parquet", "npz"))
+
+    # ------------------------------------------
+    # 📥 导出
+    # ------------------------------------------
+
+    def sync(self, store, event=None):
+        """把还没导出的归档局补进统计库，返回这次导出的局数；已导出的局不会重写"""
+        event = event or event_name(store)
+        n = 0
+        for entry in store.archived_rounds():
+            if self._exported(event, entry["round"]): continue
+            doc = store.archived_round(entry["round"])
+            if doc is None: continue
+            self.export_round(event, doc)
+            n += 1
+        return n
+
+    def export_round(self, event, doc):
+        """doc 是 store.archived_round() 读出来的一局"""
+        round_no, results, bets = doc["round"], doc["results"], doc["bets"]
+        n = len(bets)
+        self._write(event, round_no, "bets", {
+            "event": [event] * n,
+            "round": np.full(n, round_no, np.int32),
+            "player": [b["player"] for b in bets],
+            "market": [b["market"] for b in bets],
+            "choice": [b["choice"] for b in bets],
+            "amount": np.array([b["amount"] for b in bets], np.float64),
+            "won": np.array([b["choice"] == results.get(b["market"]) for b in bets], bool),
+        })
+        payouts = doc["payouts"]
+        # 结算表最后写：它存在就说明这一局两张表都导出完了
+        self._write(event, round_no, "settle", {
+            "event": [event] * len(payouts),
+            "round": np.full(len(payouts), round_no, np.int32),
+            "player": list(payouts),
+            "payout": np.array(list(payouts.values()), np.float64),
+        })
+
+    def drop_round(self, event, round_no):
+        """某一局重新结算后删掉导出的文件，下次 sync 按更正后的归档重新导出"""
+        for table in ("settle", "bets"):  # 结算表先删：它不在这一局就算没导出
+            for ext in ("parquet", "npz"):
+                path = self._path(event, round_no, table, ext)
+                if os.path.exists(path): os.remove(path)
+
+    def _write(self, event, round_no, table, cols):
+        os.makedirs(os.path.join(self.root, event), exist_ok=True)
+        coded = {}
+        for k in CODED:
+            if k in cols:
+                codes, strings = pd.factorize(pd.Series(cols[k], dtype=object))
+                coded[k] = (codes.astype(np.int32), np.array(strings, dtype=str))
+        if pq is not None:
+            arrays = {k: pa.DictionaryArray.from_arrays(*coded[k]) if k in coded else pa.array(v)
+                      for k, v in cols.items()}
+            path = self._path(event, round_no, table, "parquet")
+            pq.write_table(pa.table(arrays), path + ".tmp")
+        else:
+            arrays = {}
+            for k, v in cols.items():
+                if k in coded: arrays[k], arrays[k + DICT_SUFFIX] = coded[k]
+                else: arrays[k] = np.asarray(v)
+            path = self._path(event, round_no, table, "npz")
+            with open(path + ".tmp", "wb") as f:
+                np.savez_compressed(f, **arrays)
+        os.replace(path + ".tmp", path)
+
+    # ------------------------------------------
+    # 🔎 查询
+    # ------------------------------------------
+
+    def events(self):
+        try:
+            return sorted(e for e in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, e)))
+        except FileNotFoundError:
+            return []
+
+    def scan(self, table, columns, event=None, round_no=None, **where):
+        """
+        只读 columns 这几列，返回 DataFrame (字典列是 Categorical)。
+        event / round_no 按文件名筛，where={列: 值} 按行筛 (筛选列会一起读进来)。
+        """
+        need = list(dict.fromkeys([*columns, *where]))
+        frames = []
+        for e in ([event] if event else self.events()):
+            folder = os.path.join(self.root, e)
+            if not os.path.isdir(folder): continue
+            for fname in sorted(os.listdir(folder)):
+                r, t, ext = fname.split(".", 2)
+                if t != table or ext not in ("parquet", "npz"): continue
+                if round_no is not None and int(r[1:]) != round_no: continue
+                df = self._read(os.path.join(folder, fname), need)
+                for k, v in where.items():
+                    df = df[df[k] == v]
+                frames.append(df[columns])
+        if not frames: return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def _read(self, path, columns):
+        if path.endswith(".parquet"):
+            if pq is None: raise RuntimeError(f"读取 {path} 需要 pyarrow")
+            return pq.read_table(path, columns=columns).to_pandas()
+        with np.load(path) as z:  # NpzFile 按需解压，只碰用到的数组
+            return pd.DataFrame({
+                k: pd.Categorical.from_codes(z[k], z[k + DICT_SUFFIX]) if k + DICT_SUFFIX in z.files else z[k]
+                for k in columns})
+
+    def player_stats(self, player=None, event=None):
+        """每个玩家: 注数 / 投入 / 猜中 / 胜率 / 派彩 / ROI"""
+        where = {"player": player} if player else {}
+        bets = self.scan("bets", ["player", "amount", "won"], event=event, **where)
+        settle = self.scan("settle", ["player", "payout"], event=event, **where)
+        bets["player"] = bets["player"].astype(object)
+        settle["player"] = settle["player"].astype(object)
+        df = bets.groupby("player").agg(注数=("amount", "size"), 投入=("amount", "sum"), 猜中=("won", "sum"))
+        df["胜率"] = df["猜中"] / df["注数"]
+        df["派彩"] = settle.groupby("player")["payout"].sum().reindex(df.index, fill_value=0.0)
+        df["ROI"] = (df["派彩"] - df["投入"]) / df["投入"]
+        return df.rename_axis("玩家").sort_values("ROI", ascending=False)
+
+    def market_stats(self, market=None, event=None):
+        """每个盘口的每个选项: 注数 / 金额 / 猜中 (押中的注数) / 人气 (占该盘口金额的比例)"""
+        where = {"market": market} if market else {}
+        bets = self.scan("bets", ["market", "choice", "amount", "won"], event=event, **where)
+        for k in ("market", "choice"):
+            bets[k] = bets[k].astype(object)
+        df = bets.groupby(["market", "choice"]).agg(注数=("amount", "size"), 金额=("amount", "sum"), 猜中=("won", "sum"))
+        df["人气"] = df["金额"] / df.groupby(level="market")["金额"].transform("sum")
+        return df.rename_axis(["盘口", "选项"])
+
+    def round_stats(self, round_no=None, event=None):
+        """每届每局: 注数 / 奖池 / 人数"""
+        bets = self.scan("bets", ["event", "round", "player", "amount"], event=event, round_no=round_no)
+        bets["event"] = bets["event"].astype(object)
+        df = bets.groupby(["event", "round"]).agg(注数=("amount", "size"), 奖池=("amount", "sum"),
+                                                  人数=("player", "nunique"))
+        return df.rename_axis(["赛事", "局"])
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+from bet_store import FrozenDict, freeze, _file_stamp
+
+# ==========================================
+# 📋 盘口目录 (外置配置，改文件即生效)
+# ==========================================
+# 队伍、每局 MVP 名单、赔率、限额原来都是脚本里的常量，每次 rerun 还要重新拼一遍盘口字典，
+# 比赛中途换替补只能重启服务。现在这些放在一个 JSON 配置文件里：
+#   - 第一次运行时把脚本里的默认配置写出来，之后管理员直接改这个文件；
+#   - 读入后编译成只读的 Catalog：每局的盘口表预先拼好，选项带 {选项: 下标} 映射；
+#   - 每次 rerun 只 stat 一下文件，(inode, mtime, size) 没变就复用编译好的 Catalog，
+#     变了才重新编译，编译成功后整体替换；文件写坏了就继续用旧的，并在 error 里说明。
+#
+# 配置格式 (options 可以写 "$teams" / "$roster"，分别换成队伍列表和这一局的 MVP 名单)：
+#   {"house_odds": 2, "min_bet": 100, "max_bet": 1000, "min_markets": 1,
+#    "salary": {"1": 1000, ...}, "teams": ["A队", "B队"],
+#    "rosters": {"1": [...], ...}, "default_roster": [...],
+#    "markets": [{"name": "🏆 胜负", "type": "PVP", "options": "$teams", "ui": "radio"}, ...]}
+
+class Catalog(namedtuple("Catalog", "house_odds min_bet max_bet min_markets salary teams rounds default error")):
+    __slots__ = ()
+
+    def markets(self, round_str):
+        """{盘口: {type, options, ui, index}}，没有单独配置名单的局用默认名单"""
+        return self.rounds.get(str(round_str), self.default)
+
+    def has_option(self, round_str, market, option):
+        cfg = self.markets(round_str).get(market)
+        return cfg is not None and option in cfg["index"]
+
+def compile_catalog(conf):
+    """配置 dict -> Catalog；不引用 $roster 的盘口在各局之间共用同一个对象"""
+    teams = list(conf["teams"])
+    shared = {}
+
+    def market(m, roster):
+        opts = m["options"]
+        uses_roster = opts == "$roster"
+        if not uses_roster and m["name"] in shared: return shared[m["name"]]
+        opts = teams if opts == "$teams" else roster if uses_roster else list(opts)
+        if len(set(opts)) != len(opts): raise ValueError(f"盘口 {m['name']} 有重复选项")
+        cfg = freeze({"type": m.get("type", "PVP"), "options": opts, "ui": m.get("ui", "radio"),
+                      "index": {o: i for i, o in enumerate(opts)}})
+        if not uses_roster: shared[m["name"]] = cfg
+        return cfg
+
+    def round_markets(roster):
+        return FrozenDict((m["name"], market(m, roster)) for m in conf["markets"])
+
+    rosters = conf.get("rosters", {})
+    return Catalog(conf["house_odds"], conf["min_bet"], conf["max_bet"], conf["min_markets"],
+                   freeze(conf["salary"]), freeze(teams),
+                   FrozenDict((str(r), round_markets(list(names))) for r, names in rosters.items()),
+                   round_markets(list(conf.get("default_roster", []))), None)
+
+_cache = {}  # {绝对路径: (文件戳, Catalog)}
+_cache_lock = threading.Lock()
+
+def load(path, default):
+    """读取并编译盘口配置；文件不存在就先把 default 写出来"""
+    key = os.path.abspath(path)
+    stamp = _file_stamp(path)
+    hit = _cache.get(key)
+    if hit and hit[0] == stamp and stamp is not None: return hit[1]
+    with _cache_lock:
+        hit = _cache.get(key)
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(default, f, ensure_ascii=False, indent=4)
+            os.replace(tmp, path)
+        stamp = _file_stamp(path)
+        if hit and hit[0] == stamp: return hit[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                catalog = compile_catalog(json.load(f))
+        except (ValueError, KeyError, TypeError) as e:
+            # 配置写坏了 (或者正写到一半)：继续用上一份，下次 rerun 再试
+            old = hit[1] if hit else compile_catalog(default)
+            return old._replace(error=f"{path} 读取失败，沿用之前的盘口配置: {e}")
+        _cache[key] = (stamp, catalog)
+        return catalog
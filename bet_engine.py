@@ -0,0 +1,349 @@
+import itertools
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# ==========================================
+# 💰 结算引擎 (所有前端共用)
+# ==========================================
+# 以前每个前端都是 "逐个盘口筛一遍 DataFrame + iterrows 逐注发钱"，
+# 注单一多就是 O(盘口数 × 注单数) 的 Python 循环。
+# 这里把整局注单一次性转成 NumPy 数组：盘口 / 选项 / 玩家都编码成整数，
+# 奖池、赢家池、每注派彩、每人收益全部用向量运算一遍算完。
+
+# 单个盘口的结算结果，交给各前端按自己的格式写日志
+MarketSettlement = namedtuple("MarketSettlement", "market result type pool win_pool ratio")
+
+def market_type(cfg):
+    """btt.py 的盘口配置只有选项列表，没有类型，一律按 PVP 奖池处理"""
+    return cfg.get("type", "PVP") if isinstance(cfg, dict) else "PVP"
+
+def _num(v):
+    # numpy 标量转回 Python 数，日志里整数奖池仍然显示成 200 而不是 200.0
+    return v.item() if hasattr(v, "item") else v
+
+def settle_round(bets, results, market_config, house_odds=1.0, players=(), log=None):
+    """
+    bets: 本局注单 [{player, market, choice, amount}, ...]
+    results: {盘口: 正确选项}，按这个顺序出日志
+    players: 需要出现在收益表里的玩家 (没下注的记 0)
+    log(MarketSettlement) -> [日志行]，不传就用默认格式
+    返回 ({玩家: 本局收益}, [日志行])
+    """
+    profits = {p: 0.0 for p in players}
+    lines = []
+    if not bets or not results: return profits, lines  # 没有要结算的盘口：谁都不赔
+
+    markets = list(results)
+    m_code = {m: i for i, m in enumerate(markets)}
+    n = len(bets)
+    player, market, choice, amount = _columns(bets, ("player", "market", "choice", "amount"))
+    mk = np.fromiter((m_code.get(m, -1) for m in market), np.int64, n)
+    win = np.fromiter((c == results.get(m) for m, c in zip(market, choice)), bool, n)
+    amt = np.array(amount)
+    names, p_code = np.unique(np.array(player, dtype=object), return_inverse=True)
+
+    # 不在结算表里的盘口 (配置已经改过了) 不参与结算
+    valid = mk >= 0
+    won = valid & win
+    pool = np.zeros(len(markets), amt.dtype)
+    win_pool = np.zeros(len(markets), amt.dtype)
+    np.add.at(pool, mk[valid], amt[valid])
+    np.add.at(win_pool, mk[won], amt[won])
+
+    # 每个盘口的赔率：PVP = 总池 / 赢家池，PVE = 庄家固定赔率
+    is_pve = np.array([market_type(market_config[m]) == "PVE" for m in markets], bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pvp_ratio = np.where(win_pool > 0, pool / np.where(win_pool > 0, win_pool, 1), 0.0)
+    ratio = np.where(is_pve, house_odds, pvp_ratio)
+
+    payout = np.where(won, amt * ratio[np.where(valid, mk, 0)], 0.0)
+    for p, v in zip(names, np.bincount(p_code, payout, minlength=len(names))):
+        profits[p] = profits.get(p, 0.0) + float(v)
+
+    log = log or default_log
+    for i, m in enumerate(markets):
+        s = MarketSettlement(m, results[m], "PVE" if is_pve[i] else "PVP",
+                             _num(pool[i]), _num(win_pool[i]), float(ratio[i]))
+        lines.extend(log(s))
+    return profits, lines
+
+# ==========================================
+# 🔮 结算试算 (所有结果组合)
+# ==========================================
+# 盘口之间互不影响：先对每个盘口算出 "玩家 × 选项" 的派彩矩阵，
+# 某个结果组合的派彩就是从每个盘口的矩阵里各取一列相加。
+# 2×10×2×2×2×2 = 320 种组合只需要一次遍历注单 + 几次矩阵按列取值。
+
+WhatIf = namedtuple("WhatIf", "markets choices payout pve_net top_player top_profit")
+
+def market_options(cfg):
+    return cfg["options"] if isinstance(cfg, dict) else cfg
+
+def what_if(bets, market_config, house_odds=1.0, chunk=2048):
+    """
+    不写存档的试算。返回 WhatIf，每个字段按组合对齐：
+    choices: (组合数, 盘口数) 的选项下标，payout: 总派彩，pve_net: 庄家 PVE 净赔付 (派彩 - PVE 奖池)，
+    top_player / top_profit: 本局收益 (派彩 - 投入) 最高的玩家和他的收益
+    """
+    markets = list(market_config)
+    options = [list(market_options(market_config[m])) for m in markets]
+    choices = np.indices([len(o) for o in options]).reshape(len(markets), -1).T
+    n_combo = len(choices)
+    payout, pve_net = np.zeros(n_combo), np.zeros(n_combo)
+    if not bets: return WhatIf(markets, choices, payout, pve_net, np.full(n_combo, None, object), np.zeros(n_combo))
+
+    player, market, choice, amount = _columns(bets, ("player", "market", "choice", "amount"))
+    n = len(bets)
+    m_code = {m: i for i, m in enumerate(markets)}
+    o_code = [{o: k for k, o in enumerate(opts)} for opts in options]
+    mk = np.fromiter((m_code.get(m, -1) for m in market), np.int64, n)
+    ch = np.fromiter((o_code[i].get(c, -1) if i >= 0 else -1 for i, c in zip(mk, choice)), np.int64, n)
+    amt = np.asarray(amount, float)
+    names, p_code = np.unique(np.array(player, dtype=object), return_inverse=True)
+    spent = np.bincount(p_code, amt, minlength=len(names))
+
+    pays = []  # 每个盘口一个 (玩家数, 选项数) 的派彩矩阵
+    for i, m in enumerate(markets):
+        rows = mk == i
+        stake = np.zeros((len(names), len(options[i])))
+        hit = rows & (ch >= 0)
+        np.add.at(stake, (p_code[hit], ch[hit]), amt[hit])
+        pool, win_pool = amt[rows].sum(), stake.sum(axis=0)
+        if market_type(market_config[m]) == "PVE":
+            pay = stake * house_odds
+            pve_net += pay.sum(axis=0)[choices[:, i]] - pool
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(win_pool > 0, pool / np.where(win_pool > 0, win_pool, 1), 0.0)
+            pay = stake * ratio
+        payout += pay.sum(axis=0)[choices[:, i]]
+        pays.append(pay)
+
+    # 每个玩家在每个组合下的收益：按组合分块，玩家多、组合多时也不会一次占用太多内存
+    top_player = np.empty(n_combo, object)
+    top_profit = np.empty(n_combo)
+    for start in range(0, n_combo, chunk):
+        c = choices[start:start + chunk]
+        profit = -spent[:, None] + sum(pay[:, c[:, i]] for i, pay in enumerate(pays))
+        best = profit.argmax(axis=0)
+        top_player[start:start + chunk] = names[best]
+        top_profit[start:start + chunk] = profit[best, np.arange(len(c))]
+    return WhatIf(markets, choices, payout, pve_net, top_player, top_profit)
+
+def _columns(bets, keys):
+    """按列取注单字段。bet_store.Bet 是命名元组，整表 zip 转置一次就行，不用逐注按键取值"""
+    fields = getattr(bets[0], "_fields", None)
+    if fields and all(b.__class__ is bets[0].__class__ for b in bets):
+        cols = dict(zip(fields, zip(*bets)))
+        return [cols[k] for k in keys]
+    return [[b[k] for b in bets] for k in keys]
+
+def default_log(s):
+    if s.pool == 0: return []
+    lines = [f"[{s.market}] 结果: {s.result}"]
+    if s.win_pool == 0: lines.append(" -> 通杀")
+    elif s.type == "PVP": lines.append(f" -> 赔率 {s.ratio:.2f}")
+    return lines
+
+# ==========================================
+# 👮 合规监控
+# ==========================================
+# 玩家的已花积分 / 已玩盘口由 bet_store 的玩家索引增量维护，
+# 这里只按玩家过一遍，不再对每个玩家重新筛一遍全部注单。
+
+Compliance = namedtuple("Compliance", "player spent markets few_markets unspent")
+
+def compliance(players, player_stats, salary, min_markets):
+    """
+    player_stats: {玩家: PlayerStats} (STORE.index(data).players)
+    返回每个玩家一行，不合规的排在前面：盘口少 > 余额未清 > 合规
+    """
+    rows = []
+    for p in players:
+        s = player_stats.get(p)
+        spent, n = (s.spent, len(s.markets)) if s else (0, 0)
+        rows.append(Compliance(p, spent, n, n < min_markets, spent != salary))
+    rows.sort(key=lambda r: (not r.few_markets, not r.unspent, r.player))
+    return rows
+
+# ==========================================
+# 🧾 下注复核
+# ==========================================
+# 页面上看到的余额、封盘状态可能已经过时 (别的会话刚下注 / 管理员刚封盘)，
+# 所以每一注都交给 store.append_bet 在写盘线程拿到的最新状态上再检查一遍。
+
+def bet_check(store, user, amount, round_no, salary, extra=None):
+    """
+    返回 append_bet 用的 check(快照)：局数没变、没封盘、加上这一注不超过 salary。
+    extra(快照) 是前端自己的附加规则，返回错误信息则拒绝。
+    """
+    def check(d):
+        if d["round"] != round_no: return "本局已结算，请刷新"
+        if d["is_locked"]: return "🔒 已封盘"
+        err = extra(d) if extra else None
+        if err: return err
+        if store.player_stats(d, user).spent + amount > salary: return "余额不足"
+    return check
+
+# ==========================================
+# 🏦 庄家风险敞口 (PVE)
+# ==========================================
+# PVE 盘口不管押得多偏都按固定赔率赔，开出某个选项时庄家的净赔 =
+# 该选项押注额 × 赔率 - 该盘口总投入。两个累计值都在 bet_store 的索引里随下注增量维护，
+# 所以查敞口、算 "这个选项还能收多少" 都是 O(1)，不用回头扫注单。
+# 上限存在 meta 里：exposure_cap (每个选项的净赔上限，None 不限)、exposure_trim (超限时截断还是拒绝)。
+
+Exposure = namedtuple("Exposure", "market option stake liability net")
+
+def exposure(index, market_config, house_odds):
+    """每个 PVE 盘口的每个选项: 押注额 / 开出它时要赔的钱 / 庄家净赔"""
+    rows = []
+    for m, cfg in market_config.items():
+        if market_type(cfg) != "PVE": continue
+        total = index.total(m)
+        for o in market_options(cfg):
+            liability = index.pool(m, o) * house_odds
+            rows.append(Exposure(m, o, index.pool(m, o), liability, liability - total))
+    return rows
+
+def exposure_room(index, market, option, house_odds, cap):
+    """
+    这个选项再收多少注金，庄家净赔才会顶到 cap。每押 1 分，这个选项的净赔涨 (赔率 - 1)，
+    其它选项的净赔各降 1，所以只有押中的这一边受上限约束。赔率不超过 1 时返回 None (押多少都不会超)
+    """
+    if house_odds <= 1: return None
+    net = index.pool(market, option) * house_odds - index.total(market)
+    return max((cap - net) / (house_odds - 1), 0)
+
+def exposure_limit(store, market_config, house_odds, market, option, amount, min_bet=1):
+    """
+    交给 STORE.append_bet 的 limit：在写盘线程的最新状态上给出这一注最多能押多少。
+    不限时返回 None；超限且设置为拒绝 (或截断后不够最低注额) 时返回 0。
+    """
+    cfg = market_config.get(market)
+    if cfg is None or market_type(cfg) != "PVE": return None
+    def limit(d):
+        cap = d.get("exposure_cap")
+        if cap is None: return None
+        room = exposure_room(store.index(d), market, option, house_odds, cap)
+        if room is None or room >= amount: return None
+        if not d.get("exposure_trim", True) or room < min_bet: return 0
+        return int(room)
+    return limit
+
+# ==========================================
+# ⏳ 后台结算
+# ==========================================
+# 结算不再在管理员点击的那次 rerun 里同步跑完：点击后起一个后台线程，
+# 在点击那一刻的只读快照上算派彩、拼日志，最后用一次 STORE.update() 提交
+# (金库、局数、注单清空、日志、归档一起生效)，玩家在任何时刻都看不到 "发了一半钱" 的状态。
+# 进度挂在进程内的任务表上，管理员页面用定时片段轮询显示。
+
+_job_ids = itertools.count(1)
+_jobs = {}  # {store: SettleJob}，每个存档同一时间只有一个结算任务
+_jobs_lock = threading.Lock()
+
+class SettleJob:
+    def __init__(self, round_no):
+        self.id = next(_job_ids)
+        self.round = round_no
+        self.state = "running"  # running / done / failed
+        self.progress, self.message = 0.0, "准备中"
+        self.error = None
+
+    def report(self, progress, message):
+        self.progress, self.message = progress, message
+
+def start_settlement(store, work):
+    """
+    work(快照) -> settle(d)：在冻结的快照上算好结果，返回真正修改存档的 fn。
+    已经有结算在跑就直接返回那个任务，不会重复结算。
+    """
+    with _jobs_lock:
+        job = _jobs.get(store)
+        if job is not None and job.state == "running": return job
+        snap = store.snapshot()
+        job = _jobs[store] = SettleJob(snap["round"])
+    threading.Thread(target=_run_settlement, args=(store, job, snap, work), name="settle", daemon=True).start()
+    return job
+
+def settlement_job(store):
+    return _jobs.get(store)
+
+def _run_settlement(store, job, snap, work):
+    try:
+        job.report(0.1, f"计算派彩 ({len(snap['bets'])} 注)")
+        settle = work(snap)
+        job.report(0.7, "写入存档")
+
+        def commit(d):
+            # 快照之后有人改过这一局 (还没封盘时有新注单 / 别处已经结算)，算出来的结果就作废
+            if d["round"] != snap["round"] or len(d["bets"]) != len(snap["bets"]):
+                raise RuntimeError("结算期间注单有变化，请重新结算")
+            settle(d)
+        store.update(commit)
+        job.report(1.0, "完成")
+        job.state = "done"
+    except Exception as e:
+        job.error, job.state = str(e), "failed"
+
+# ==========================================
+# 🛠️ 重新结算 (更正填错的结果)
+# ==========================================
+# 盘口之间互不影响，改一个盘口的结果只会改这个盘口的派彩。所以只从归档里取出
+# 被更正盘口的注单，分别按旧结果、新结果各算一遍，差额直接加到金库上：
+# 别的盘口、别的局都不用重算；排行榜随金库只重排分数变了的玩家，日志追加一段更正记录，
+# 归档里这一局的结果和派彩也一起改掉，之后再更正、跨赛事统计都以新结果为准。
+
+Resettle = namedtuple("Resettle", "round changed delta lines")
+
+def resettle_delta(doc, corrections, market_config=None, house_odds=1.0, log=None):
+    """
+    doc: store.archived_round(n)；corrections: {盘口: 正确结果}
+    按归档里记下的结算时盘口配置和庄家赔率重算，之后热更新过配置也不影响；
+    传进来的 market_config / house_odds 只给没记配置的旧归档用。
+    返回 Resettle(局数, {盘口: (旧结果, 新结果)}, {玩家: 金库差额}, [日志行])，结果没变的盘口忽略
+    """
+    market_config = doc.get("markets") or market_config
+    house_odds = doc.get("house_odds", house_odds)
+    old = doc["results"]
+    changed = {m: (old.get(m), r) for m, r in corrections.items() if old.get(m) != r}
+    if not changed: return Resettle(doc["round"], {}, {}, [])
+    bets = [b for b in doc["bets"] if b["market"] in changed]
+    before, _ = settle_round(bets, {m: o for m, (o, _) in changed.items() if o is not None}, market_config, house_odds)
+    after, market_lines = settle_round(bets, {m: r for m, (_, r) in changed.items()}, market_config, house_odds, log=log)
+    delta = {p: after.get(p, 0.0) - before.get(p, 0.0) for p in set(before) | set(after)}
+    delta = {p: v for p, v in sorted(delta.items()) if abs(v) > 1e-9}
+    lines = [f"=== 第 {doc['round']} 局重新结算 ==="]
+    lines.extend(f"[{m}] 结果更正: {o} -> {r}" for m, (o, r) in changed.items())
+    lines.extend(market_lines)
+    lines.extend(f"{p} {v:+.1f}" for p, v in delta.items())
+    return Resettle(doc["round"], changed, delta, lines)
+
+def resettle(store, round_no, corrections, market_config=None, house_odds=1.0, log=None, fix=None):
+    """
+    重新结算已归档的第 round_no 局，一次 store.update() 提交金库差额、日志和归档。
+    fix(d, Resettle) 给前端改自己额外记的状态 (比如 cebet 的 match_history)。
+    """
+    doc = store.archived_round(round_no)
+    if doc is None: raise ValueError(f"第 {round_no} 局没有归档，无法重新结算")
+    r = resettle_delta(doc, corrections, market_config, house_odds, log)
+    if not r.changed: return r
+    payouts = dict(doc["payouts"])
+    for p, v in r.delta.items():
+        payouts[p] = payouts.get(p, 0.0) + v
+
+    def apply(d):
+        # 计算用的是读出来的归档；提交时它要还是这一局最新的结果，否则两次更正会叠加
+        entry = {e["round"]: e for e in store.archived_rounds()}.get(round_no)
+        if entry is None or entry["results"] != doc["results"]:
+            raise RuntimeError(f"第 {round_no} 局的结果刚被改过，请刷新后重试")
+        for p, v in r.delta.items():
+            d["vault"][p] = d["vault"].get(p, 0) + v
+        if fix: fix(d, r)
+        d["logs"].extend(r.lines)
+        d["archive"] = {"round": round_no, "results": {**doc["results"], **corrections}, "payouts": payouts}
+    store.update(apply)
+    return r
@@ -0,0 +1,1386 @@
+import bisect
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # 没装 sortedcontainers 时退回下面的 bisect 有序列表
+    SortedList = None
+
+# 存档后端：默认 json，可用环境变量 BET_BACKEND=sqlite 切换，前端脚本无需改动
+DEFAULT_BACKEND = os.environ.get("BET_BACKEND", "json")
+# 组提交窗口 (秒)：这段时间内到达的下注合并成一次写盘 + fsync
+GROUP_COMMIT_WINDOW = float(os.environ.get("BET_GROUP_COMMIT_MS", "10")) / 1000
+LIMIT_ERROR = "🏦 该选项已达庄家赔付上限"  # append_bet 的 limit 返回 0 时的提示
+log = logging.getLogger(__name__)
+# 读档时遇到这些异常就当存档损坏，尝试用事件流水恢复
+DAMAGED = (ValueError, KeyError, TypeError, FileNotFoundError, sqlite3.DatabaseError)
+
+class DamagedStore(Exception):
+    """存档读不出来，事件流水又不完整，没法自动恢复；坏文件原样留着等人处理"""
+    def __init__(self, path, events, cause):
+        super().__init__(f"存档 {path} 无法读取 ({cause})，事件流水 {events} 不完整，无法自动恢复")
+        self.path, self.events, self.cause = path, events, cause
+        self.quarantined = sorted(glob.glob(glob.escape(path) + ".damaged-*"))  # 以前自动恢复时挪开的坏文件
+
+def open_backend(db_file, kind=None):
+    kind = kind or DEFAULT_BACKEND
+    if kind == "json": return JsonBackend(db_file)
+    if kind == "sqlite": return SqliteBackend(os.path.splitext(db_file)[0] + ".db")
+    raise ValueError(f"未知的存档后端: {kind}")
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def open_store(db_file, new_game, kind=None):
+    """同一个存档在进程内只有一个 Store，所有会话、每次 rerun 拿到的都是它"""
+    kind = kind or DEFAULT_BACKEND
+    with _stores_lock:
+        key = (kind, os.path.abspath(db_file))
+        if key not in _stores:
+            _stores[key] = Store(open_backend(db_file, kind), new_game)
+        return _stores[key]
+
+@contextmanager
+def file_lock(path):
+    """跨进程写锁 (锁文件)，只在比较版本 + 写盘的一瞬间持有"""
+    with open(path, "a+") as f:
+        if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+        else: f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_UN)
+            else: f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+# ==========================================
+# 🎫 注单记录
+# ==========================================
+# 注单原来是 dict：每一注都带一份键名，玩家 / 盘口 / 选项这些长字符串 (如 "温鹏祥队-上单：童颜")
+# 每读一次档就在内存里复制几千份。Bet 是只有 __slots__ 的命名元组，字符串用 sys.intern 共用一份；
+# 页面代码照旧 b["market"] / b.get(...) 取值，和 JSON 里的 dict 可以无损互转。
+# 存盘时注单按列写：玩家 / 盘口 / 选项换成字符串表里的下标 (encode_bets / decode_bets)。
+
+BET_FIELDS = ("player", "market", "choice", "amount", "timestamp")
+BET_CODED = ("player", "market", "choice")  # 取值重复很多、按字典编码的列
+_BET_POS = {k: i for i, k in enumerate(BET_FIELDS)}
+
+def _intern(v):
+    return sys.intern(v) if v.__class__ is str else v
+
+class Bet(namedtuple("Bet", BET_FIELDS)):
+    __slots__ = ()
+
+    def __getitem__(self, k):
+        return tuple.__getitem__(self, _BET_POS[k] if k.__class__ is str else k)
+
+    def __contains__(self, k):
+        return k in _BET_POS
+
+    def get(self, k, default=None):
+        i = _BET_POS.get(k)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return BET_FIELDS
+
+    def items(self):
+        return zip(BET_FIELDS, self)
+
+    def to_dict(self):
+        return dict(zip(BET_FIELDS, self))
+
+def to_bet(b):
+    """dict -> Bet；字段不是标准的那五个就原样返回 dict，保证无损"""
+    if b.__class__ is Bet or len(b) != len(BET_FIELDS) or any(k not in b for k in BET_FIELDS): return b
+    return Bet(_intern(b["player"]), _intern(b["market"]), _intern(b["choice"]), b["amount"], b["timestamp"])
+
+def bet_dict(b):
+    return b.to_dict() if b.__class__ is Bet else dict(b)
+
+def encode_bets(bets):
+    """注单列表 -> 按列存的 {n, strings, columns}，字典编码的列只存下标"""
+    cols = {k: [b.get(k) for b in bets] for k in dict.fromkeys(k for b in bets for k in b.keys())}
+    strings = {}
+    for k in BET_CODED:
+        if k not in cols: continue
+        table = {}
+        cols[k] = [table.setdefault(v, len(table)) for v in cols[k]]
+        strings[k] = list(table)
+    return {"n": len(bets), "strings": strings, "columns": cols}
+
+def decode_bets(doc):
+    """encode_bets 的逆操作；旧存档里的 dict 列表也认"""
+    if isinstance(doc, list): return [to_bet(b) for b in doc]
+    cols = dict(doc["columns"])
+    for k, table in doc["strings"].items():
+        table = [_intern(v) for v in table]
+        cols[k] = [table[i] for i in cols[k]]
+    rows = zip(*cols.values())
+    if tuple(cols) == BET_FIELDS: return list(map(Bet._make, rows))
+    return [to_bet(dict(zip(cols, row))) for row in rows]
+
+# ==========================================
+# 💾 JSON 后端 (分块存档 + 下注流水)
+# ==========================================
+# 存档按冷热拆成几块：DB_FILE 只放局面元数据 (round、is_locked、reg_closed 等) 和各块的代号，
+# users / vault / bets 各自一个 {base}.{块名}.{代号}.json。
+# 登录只读账号表、排行榜只读金库，不用把整局注单也解析一遍；
+# 写入时只有内容变了的块才换新代号重写，封盘这种操作只重写很小的元数据文件。
+# 元数据文件最后用 os.replace 原子替换，它就是提交点：崩在中途也只会留下没人引用的新块。
+#
+# 下注不重写任何块，而是往当前 bets 块对应的流水文件 {base}.{代号}.journal 末尾追加一行，
+# 读档时用 "bets 块 + 流水回放" 还原完整注单。bets 块换代时流水也跟着换新，旧流水随即删除。
+#
+# 历史日志不放进快照：每次结算的日志是一个分段 (chunk)，单独存成 {base}.logs/ 下的一个文件，
+# 再在 index.jsonl 里记一行 {chunk, round, lines}。看日志时按分段一页页读，搜索也是逐个文件流式扫描。
+
+SECTIONS = {"users": dict, "vault": dict, "bets": list}  # 单独存放的块及其空值
+
+class JsonBackend:
+    def __init__(self, db_file):
+        self.db_file = self.path = db_file
+        self._cache = {}  # {块名: (代号, 冻结的内容)}，代号没变就不重新解析
+        self._journal = None  # 上次数到的流水位置，见 _journal_lines()
+
+    def _base(self):
+        return os.path.splitext(self.db_file)[0]
+
+    def journal_path(self, gen):
+        return f"{self._base()}.{gen}.journal"
+
+    def section_path(self, name, gen):
+        return f"{self._base()}.{name}.{gen}.json"
+
+    def exists(self):
+        return os.path.exists(self.db_file)
+
+    def stamp(self, data=None):
+        """元数据文件 + 当前流水文件的 (inode, mtime, size)，任一变化说明有人写过"""
+        gen = data.get("journal", 0) if data else 0
+        return (_file_stamp(self.db_file), _file_stamp(self.journal_path(gen)))
+
+    def _read_meta(self):
+        with open(self.db_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_section(self, name, gen):
+        hit = self._cache.get(name)
+        if hit and hit[0] == gen: return hit[1]
+        with open(self.section_path(name, gen), "r", encoding="utf-8") as f:
+            value = json.load(f)
+        value = freeze(decode_bets(value) if name == "bets" else value)
+        self._cache[name] = (gen, value)
+        return value
+
+    def _retry(self, fn):
+        # 别的进程刚提交完会删掉旧块，读到一半文件没了就按新的元数据重读
+        for _ in range(5):
+            try:
+                return fn()
+            except FileNotFoundError:
+                time.sleep(0.01)
+        return fn()
+
+    def load(self):
+        return self._retry(self._load)
+
+    def _load(self):
+        data = self._read_meta()
+        for name, gen in (data.get("sections") or {}).items():
+            data[name] = self._read_section(name, gen)
+        data["bets"] = [to_bet(b) for b in data.get("bets", [])]  # 下面要往里回放流水
+        n = 0
+        path = self.journal_path(data.get("journal", 0))
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        data["bets"].append(to_bet(json.loads(line)))
+                    except ValueError:
+                        break  # 最后一行可能是崩溃时写了一半的记录
+                    n += 1
+        # 每条流水算一次提交；写元数据时已经算进 version 的那部分流水不重复计
+        data["version"] = data.get("version", 0) + n - data.get("journal_seen", 0)
+        return data
+
+    def version(self):
+        """存档里已提交的版本号：元数据里的加上之后追加的流水行数"""
+        def read():
+            meta = self._read_meta()
+            return meta.get("version", 0) + self._journal_lines(meta.get("journal", 0)) - meta.get("journal_seen", 0)
+        return self._retry(read)
+
+    def load_section(self, name):
+        """只读一块：meta (局面元数据) / users / vault"""
+        def read():
+            meta = self._read_meta()
+            if name == "meta": return meta
+            gen = (meta.get("sections") or {}).get(name)
+            return self._read_section(name, gen) if gen is not None else meta.get(name, SECTIONS[name]())
+        return self._retry(read)
+
+    def lock(self):
+        return file_lock(self.db_file + ".lock")
+
+    def _write_json(self, path, value, indent=4):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":"))
+        os.replace(tmp, path)
+
+    def save(self, data, prev=None):
+        """prev 是写入前的状态，和它相同的块沿用原来的文件"""
+        refs = dict(data.get("sections") or {})
+        gen = max([data.get("journal", 0), *refs.values()]) + 1
+        for name, empty in SECTIONS.items():
+            if name in refs and prev is not None and prev.get(name, empty()) == data.get(name, empty()):
+                continue
+            if name == "bets": self._write_json(self.section_path(name, gen), encode_bets(data.get("bets", [])), None)
+            else: self._write_json(self.section_path(name, gen), data.get(name, empty()))
+            refs[name] = gen
+
+        if refs["bets"] == gen:
+            if os.path.exists(self.journal_path(gen)): os.remove(self.journal_path(gen))  # 删档前残留的同名流水
+            data["journal_seen"] = 0
+        else:
+            data["journal_seen"] = self._journal_lines(refs["bets"])
+        data["journal"], data["sections"] = refs["bets"], refs
+        self._write_json(self.db_file, {k: v for k, v in data.items() if k not in SECTIONS})
+
+        # 提交完成，清理不再被引用的旧块和旧流水
+        for name in SECTIONS:
+            for path in glob.glob(glob.escape(self._base()) + f".{name}.*.json"):
+                if path != self.section_path(name, refs[name]): os.remove(path)
+        for path in glob.glob(glob.escape(self._base()) + ".*.journal"):
+            if path != self.journal_path(refs["bets"]): os.remove(path)
+
+    def _journal_lines(self, gen):
+        """
+        流水里完整的行数。流水只追加，所以记住上次数到的 (代号, inode, 开头几个字节, 字节偏移, 行数)，
+        下次只数偏移之后新增的部分：本进程刚追加的几注、或者别的进程追加的那一段。
+        每次提交都要在写锁里核对版本号，不能每次都把整局流水重读一遍。
+        """
+        try:
+            f = open(self.journal_path(gen), "rb")
+        except FileNotFoundError:
+            self._journal = None
+            return 0
+        with f:
+            ino = os.fstat(f.fileno()).st_ino
+            hit = self._journal
+            head = f.read(64)
+            if hit and hit[:3] == (gen, ino, head):  # 开头也要对得上：删档后同名同 inode 的新流水要从头数
+                offset, n = hit[3], hit[4]
+            else:
+                offset, n = 0, 0
+            f.seek(offset)
+            tail = f.read()
+        n += tail.count(b"\n")  # 最后一行可能是崩溃时写了一半的记录，只数完整的行
+        self._journal = (gen, ino, head, offset + tail.rfind(b"\n") + 1, n)
+        return n
+
+    def append_bets(self, data, bets):
+        """下注只往流水末尾追加，一批注单一次 write + fsync，耗时与存档大小无关"""
+        lines = "".join(json.dumps(bet_dict(b), ensure_ascii=False, separators=(",", ":")) + "\n" for b in bets)
+        with open(self.journal_path(data.get("journal", 0)), "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        """删档：元数据、各块、所有流水和日志分段一起删掉"""
+        if os.path.exists(self.db_file): os.remove(self.db_file)
+        base = glob.escape(self._base())
+        for path in glob.glob(base + ".*.journal"):
+            os.remove(path)
+        for name in SECTIONS:
+            for path in glob.glob(base + f".{name}.*.json"):
+                os.remove(path)
+        shutil.rmtree(self.log_dir(), ignore_errors=True)
+        self._cache.clear()
+        self._journal = None
+
+    def log_dir(self):
+        return self._base() + ".logs"
+
+    def archive_dir(self):
+        return self._base() + ".archive"
+
+    def events_path(self):
+        return self._base() + ".events.jsonl"
+
+    def quarantine(self):
+        """读不出来的元数据挪到一边留作排查，之后由事件重放重新写一份；各块和日志分段不动"""
+        if os.path.exists(self.db_file): os.replace(self.db_file, f"{self.db_file}.damaged-{int(time.time())}")
+        self._cache.clear()
+        self._journal = None
+
+    def append_log(self, chunk, round_no, lines):
+        """先写分段文件再登记索引；同一个 chunk 重写是覆盖，读索引时同号只保留最后一条"""
+        os.makedirs(self.log_dir(), exist_ok=True)
+        path = os.path.join(self.log_dir(), f"{chunk:08d}.log")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("".join(l + "\n" for l in lines))
+        os.replace(path + ".tmp", path)
+        entry = json.dumps({"chunk": chunk, "round": round_no, "lines": len(lines)}, ensure_ascii=False)
+        with open(os.path.join(self.log_dir(), "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(entry + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def log_chunks(self):
+        chunks = {}
+        try:
+            with open(os.path.join(self.log_dir(), "index.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        break
+                    chunks[e["chunk"]] = (e["chunk"], e["round"], e["lines"])
+        except FileNotFoundError:
+            pass
+        return [chunks[k] for k in sorted(chunks)]
+
+    def read_log(self, chunk):
+        try:
+            with open(os.path.join(self.log_dir(), f"{chunk:08d}.log"), "r", encoding="utf-8") as f:
+                return [l.rstrip("\n") for l in f]
+        except FileNotFoundError:
+            return []
+
+    def search_logs(self, text, limit):
+        hits = []
+        for chunk, round_no, _ in reversed(self.log_chunks()):
+            with open(os.path.join(self.log_dir(), f"{chunk:08d}.log"), "r", encoding="utf-8") as f:
+                found = [(round_no, l.rstrip("\n")) for l in f if text in l]
+            hits.extend(reversed(found))  # 和页面一样新的在前
+            if len(hits) >= limit: break
+        return hits[:limit]
+
+# ==========================================
+# 🗄️ SQLite 后端 (WAL 模式)
+# ==========================================
+# users / vault / bets / logs 各自一张表，其余字段 (round、is_locked 等) 存 meta 表。
+# bets 表只存当前局 (结算时整表清空)，按 (局, 盘口, 选项) 和 (局, 玩家) 建索引，
+# 方便直接在库里查奖池 / 个人注单；页面上的奖池、注单仍走快照上的 BetIndex。
+# logs 表带 chunk (结算分段) 列，看日志按分段分页，搜索直接在库里按子串 (instr) 匹配。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS users (name TEXT PRIMARY KEY, password TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS vault (player TEXT PRIMARY KEY, score REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS bets (
+    id INTEGER PRIMARY KEY,
+    round INTEGER NOT NULL,
+    market TEXT NOT NULL,
+    choice TEXT NOT NULL,
+    player TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    timestamp REAL
+);
+CREATE INDEX IF NOT EXISTS idx_bets_pool ON bets (round, market, choice);
+CREATE INDEX IF NOT EXISTS idx_bets_player ON bets (round, player);
+CREATE TABLE IF NOT EXISTS logs (id INTEGER PRIMARY KEY, line TEXT NOT NULL, chunk INTEGER NOT NULL DEFAULT 0, round INTEGER);
+CREATE INDEX IF NOT EXISTS idx_logs_chunk ON logs (chunk);
+"""
+TABLE_KEYS = ("users", "vault", "bets", "logs")
+
+class SqliteBackend:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()  # sqlite 连接不能跨线程，Streamlit 每个会话一个线程
+        self._epoch = 0  # 删档后递增，让各线程重新连接新文件
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.epoch != self._epoch:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")  # 每次提交都 fsync，下注靠组提交摊薄
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name='logs'").fetchone():
+                cols = [r[1] for r in conn.execute("PRAGMA table_info(logs)")]
+                if "chunk" not in cols:  # 旧存档：已有日志都归到 0 号分段
+                    conn.execute("ALTER TABLE logs ADD COLUMN chunk INTEGER NOT NULL DEFAULT 0")
+                    conn.execute("ALTER TABLE logs ADD COLUMN round INTEGER")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.epoch = conn, self._epoch
+        return conn
+
+    def stamp(self, data=None):
+        """
+        库文件 inode + 已提交的版本号。不能只看 db / -wal 的文件戳：
+        WAL 下文件先变、提交后可见，这时读到的旧状态会被当成新戳缓存下来。
+        """
+        st = _file_stamp(self.path)
+        if st is None: return None
+        try:
+            return (st[0], self._version(self._conn()))
+        except sqlite3.DatabaseError:
+            return st
+
+    @staticmethod
+    def _version(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+        return json.loads(row[0]) if row else 0
+
+    def version(self):
+        """写锁里核对的版本号：开 IMMEDIATE 事务读，拿到的一定是库里最新提交的值"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            return self._version(conn)
+        finally:
+            conn.execute("COMMIT")
+
+    def lock(self):
+        return file_lock(self.path + ".lock")
+
+    def exists(self):
+        if not os.path.exists(self.path): return False
+        try:
+            return self._conn().execute("SELECT 1 FROM meta WHERE key='round'").fetchone() is not None
+        except sqlite3.DatabaseError:
+            return True  # 文件在但读不出来：交给 load() 报错，由 Store 从事件恢复
+
+    def load(self):
+        conn = self._conn()
+        conn.execute("BEGIN")  # 几张表在同一个读事务里查，拿到的是同一次提交后的状态
+        try:
+            data = {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM meta")}
+            data["users"] = dict(conn.execute("SELECT name, password FROM users"))
+            data["vault"] = dict(conn.execute("SELECT player, score FROM vault"))
+            rows = conn.execute(
+                "SELECT player, market, choice, amount, timestamp FROM bets WHERE round=? ORDER BY id", (data["round"],))
+            data["bets"] = [self._bet(r) for r in rows]
+        finally:
+            conn.execute("COMMIT")
+        data["logs"] = []  # 日志按分段单独读，见 read_log()
+        return data
+
+    def load_section(self, name):
+        """只查一张表：meta (局面元数据) / users / vault"""
+        conn = self._conn()
+        if name == "meta": return {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM meta")}
+        if name == "users": return dict(conn.execute("SELECT name, password FROM users"))
+        if name == "vault": return dict(conn.execute("SELECT player, score FROM vault"))
+        raise ValueError(f"未知的存档分块: {name}")
+
+    def save(self, data, prev=None):
+        """prev 是写入前的状态，和它相同的表不重写"""
+        def changed(name):
+            return name in data and (prev is None or prev.get(name) != data[name])
+
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(k, json.dumps(v, ensure_ascii=False)) for k, v in data.items() if k not in TABLE_KEYS])
+            if changed("users"):
+                conn.execute("DELETE FROM users")
+                conn.executemany("INSERT INTO users VALUES (?, ?)", data["users"].items())
+            if changed("vault"):
+                conn.execute("DELETE FROM vault")
+                conn.executemany("INSERT INTO vault VALUES (?, ?)", data["vault"].items())
+            if changed("bets"):
+                conn.execute("DELETE FROM bets")
+                conn.executemany("INSERT INTO bets (round, market, choice, player, amount, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                                 [self._row(data["round"], b) for b in data["bets"]])
+
+    def append_bets(self, data, bets):
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO bets (round, market, choice, player, amount, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                             [self._row(data["round"], b) for b in bets])
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(data.get("version", 0) + len(bets)),))
+
+    def archive_dir(self):
+        return os.path.splitext(self.path)[0] + ".archive"
+
+    def events_path(self):
+        return os.path.splitext(self.path)[0] + ".events.jsonl"
+
+    def quarantine(self):
+        """损坏的库文件整个挪开 (日志表也在里面，只能一起挪)，各线程下次用时重新建库"""
+        self._epoch += 1
+        stamp = int(time.time())
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix): os.replace(self.path + suffix, f"{self.path}.damaged-{stamp}{suffix}")
+
+    def remove(self):
+        self._epoch += 1
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix): os.remove(self.path + suffix)
+
+    def append_log(self, chunk, round_no, lines):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM logs WHERE chunk=?", (chunk,))
+            conn.executemany("INSERT INTO logs (line, chunk, round) VALUES (?, ?, ?)",
+                             [(l, chunk, round_no) for l in lines])
+
+    def log_chunks(self):
+        return self._conn().execute(
+            "SELECT chunk, MIN(round), COUNT(*) FROM logs GROUP BY chunk ORDER BY chunk").fetchall()
+
+    def read_log(self, chunk):
+        return [r[0] for r in self._conn().execute("SELECT line FROM logs WHERE chunk=? ORDER BY id", (chunk,))]
+
+    def search_logs(self, text, limit):
+        # 不用 LIKE：它对英文字母不分大小写，和 JSON 后端的子串匹配结果不一样
+        return self._conn().execute(
+            "SELECT round, line FROM logs WHERE instr(line, ?) > 0 ORDER BY id DESC LIMIT ?",
+            (text, limit)).fetchall()
+
+    @staticmethod
+    def _row(round_no, b):
+        return (round_no, b["market"], b["choice"], b["player"], b["amount"], b.get("timestamp"))
+
+    @staticmethod
+    def _bet(r):
+        return Bet(_intern(r[0]), _intern(r[1]), _intern(r[2]), r[3], r[4])
+
+# ==========================================
+# 🗄️ 历史局归档 (每局一个只读文件)
+# ==========================================
+# 结算时把这一局的注单、结果、派彩写成 {base}.archive/round_0001.json.gz，写完不再改动；
+# 再在 index.jsonl 里记一行摘要。热数据 (存档里的 bets) 结算后照旧清空，
+# 历史注单只在查账 / 统计时按局读取。两种后端共用这套文件。
+# 文件里的注单和存档的注单块一样按列存 (encode_bets)，一局几千注也只有几十 KB。
+
+class RoundArchive:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, round_no):
+        return os.path.join(self.root, f"round_{round_no:04d}.json.gz")
+
+    def write(self, round_no, bets, results, payouts, config=None, **extra):
+        """
+        写入一局的归档并登记索引；同一局重写 (结算中途崩溃后重来) 以最后一次为准。
+        config 是结算时用的 {markets, house_odds}，只存进归档文件，不进索引。
+        """
+        os.makedirs(self.root, exist_ok=True)
+        packed = encode_bets(bets)
+        doc = {"round": round_no, "results": dict(results), "payouts": dict(payouts), **(config or {}), **packed, **extra}
+        path = self.path(round_no)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        entry = {"round": round_no, "file": os.path.basename(path), "bets": len(bets),
+                 "pool": sum(b["amount"] for b in bets), "players": len(packed["strings"].get("player", [])),
+                 "results": dict(results), **extra}
+        with open(os.path.join(self.root, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def rounds(self):
+        """[索引行]，按局数排列"""
+        rounds = {}
+        try:
+            with open(os.path.join(self.root, "index.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        break
+                    rounds[e["round"]] = e
+        except FileNotFoundError:
+            pass
+        return [rounds[k] for k in sorted(rounds)]
+
+    def read(self, round_no):
+        """{round, results, payouts, bets: [Bet]} (结算时记了配置的还有 markets / house_odds)；没有这一局返回 None"""
+        try:
+            with gzip.open(self.path(round_no), "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+        except FileNotFoundError:
+            return None
+        doc["bets"] = decode_bets({"strings": doc.pop("strings"), "columns": doc.pop("columns")})
+        return doc
+
+    def rotate(self):
+        """
+        删档时把这一届的归档整个改名成 {root}@首局结算时间 留着 (归档写完就不再动，删档也不删)，
+        下一届从空目录开始，局号、索引不会和上一届混在一起。返回改名后的目录，没有归档返回 None。
+        """
+        if not os.path.isdir(self.root): return None
+        rounds = self.rounds()
+        stamp = rounds[0].get("settled_at") if rounds else None
+        stamp = (stamp or time.strftime("%Y-%m-%d %H:%M:%S")).replace(" ", "_").replace(":", "")
+        dest, n = f"{self.root}@{stamp}", 1
+        while os.path.exists(dest):
+            n += 1
+            dest = f"{self.root}@{stamp}.{n}"
+        os.replace(self.root, dest)
+        return dest
+
+# ==========================================
+# 🧾 事件流水 (可重放，存档损坏时自动恢复)
+# ==========================================
+# 存档只有 "现在的样子"，写坏了或者结算结果填错了就回不去。
+# 所以每次提交 (注册、下注、封盘、结算……) 都在 {base}.events.jsonl 末尾追加一条事件，
+# 从开局事件起按顺序折叠 (replay) 就能得到和线上一模一样的状态，两种后端共用这一份文件：
+#   init    开局 (或第一次记事件时) 的完整状态
+#   bets    一次组提交追加的注单，每注是 [player, market, choice, amount, timestamp]
+#   其它    Store.update() 前后的差异：set / unset 顶层字段，merge / drop users、vault 里的键。
+#           类型 (register / lock / settle / update) 按改动的字段推断，结算事件还带上结果和派彩。
+# 每条事件都带提交后的 version，replay(events, until=版本号) 可以停在任意一次提交之后。
+# 日志分段、历史局归档本来就是独立文件，不进事件。
+
+EVENT_SKIP = ("version", "journal", "journal_seen", "sections", "logs")  # 后端记账用的字段
+INIT_PREFIX, BETS_PREFIX = b'{"e":"init"', b'{"e":"bets"'  # json.dumps 按插入顺序写键，类型总在最前
+_MISSING = object()
+
+class EventLog:
+    def __init__(self, path):
+        self.path = path
+        self.gap_path = path + ".gap"  # 有提交没记进流水时留下的标记，重放出来会少一次提交
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def complete(self):
+        """流水是从开局事件记起的、中间也没有漏记的提交，才能重放出完整状态"""
+        if os.path.exists(self.gap_path): return False
+        try:
+            with open(self.path, "rb") as f:
+                return f.read(len(INIT_PREFIX)) == INIT_PREFIX
+        except FileNotFoundError:
+            return False
+
+    def mark_gap(self, version):
+        """存档已经提交了 version，事件却没写进来：之后不能再拿这份流水恢复存档"""
+        with open(self.gap_path, "a", encoding="utf-8") as f:
+            f.write(f"{version}\n")
+
+    def append(self, events, truncate=False):
+        """追加一批事件，一次 write + fsync；truncate=True 时先清空 (新开一局)，漏记标记也一起清掉"""
+        data = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events).encode("utf-8")
+        with open(self.path, "wb" if truncate else "a+b") as f:
+            end = f.seek(0, 2)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":  # 上次崩溃时写了一半的事件，截掉再接着写
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b"\n") + 1)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if truncate and os.path.exists(self.gap_path): os.remove(self.gap_path)
+
+    def read(self, latest=False):
+        """
+        全部事件，写了一半的最后一行丢掉。latest=True 只用于重放到最新状态：
+        最后一次清空注单 (开局 / 结算) 之前的 bets 事件反正会被清掉，连解析都省了。
+        文件里绝大多数是 bets 事件，所以恢复时间基本只和当前这一局的注单数有关。
+        """
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return []
+        raw = raw[:raw.rfind(b"\n") + 1]
+        if not raw: return []
+        if not latest: return json.loads(b"[" + raw[:-1].replace(b"\n", b",") + b"]")
+        lines = raw[:-1].split(b"\n")
+        # 先只解析非 bets 事件 (每条事件都以 {"e":"类型" 开头)，找到最后一次清空注单的位置
+        events = [None if line.startswith(BETS_PREFIX) else json.loads(line) for line in lines]
+        reset = max((i for i, ev in enumerate(events) if ev and (ev["e"] == "init" or "bets" in ev.get("set", ()))),
+                    default=0)
+        return [ev if ev is not None else json.loads(lines[i])
+                for i, ev in enumerate(events) if ev is not None or i > reset]
+
+    def remove(self):
+        for path in (self.path, self.gap_path):
+            if os.path.exists(path): os.remove(path)
+
+def state_of(data):
+    """存档里参与事件重放的部分 (去掉后端记账字段和日志)"""
+    return {k: v for k, v in data.items() if k not in EVENT_SKIP}
+
+def _bet_rows(bets):
+    return [list(b) if b.__class__ is Bet else bet_dict(b) for b in bets]
+
+def _row_bets(rows):
+    return [Bet(_intern(r[0]), _intern(r[1]), _intern(r[2]), r[3], r[4]) if r.__class__ is list else to_bet(r)
+            for r in rows]
+
+def init_event(data):
+    state = state_of(data)
+    state["bets"] = _bet_rows(state.get("bets", []))
+    return {"e": "init", "v": data.get("version", 0), "at": round(time.time(), 3), "state": state}
+
+def bets_event(version, bets):
+    return {"e": "bets", "v": version, "rows": _bet_rows(bets)}
+
+def diff_event(old, new, settled=None):
+    """old -> new 的一次 update() 提交；users / vault 只记变了的键"""
+    ev = {"e": "update", "v": new["version"], "at": round(time.time(), 3)}
+    put, merge, drop = {}, {}, {}
+    for k, v in new.items():
+        if k in EVENT_SKIP: continue
+        was = old.get(k, _MISSING)
+        if was == v: continue
+        if k in ("users", "vault") and isinstance(was, dict):
+            merge[k] = {x: y for x, y in v.items() if was.get(x, _MISSING) != y}
+            gone = [x for x in was if x not in v]
+            if gone: drop[k] = gone
+        else:
+            put[k] = _bet_rows(v) if k == "bets" else v
+    unset = [k for k in old if k not in new and k not in EVENT_SKIP]
+    for name, part in (("set", put), ("unset", unset), ("merge", merge), ("drop", drop)):
+        if part: ev[name] = part
+    if settled is not None:  # 带 round 的是重新结算已归档的某一局
+        ev["e"], ev["settled"] = "resettle" if "round" in settled else "settle", settled
+    elif "users" in merge or "users" in drop:
+        ev["e"] = "register"
+    elif "is_locked" in put:
+        ev["e"] = "lock"
+    return ev
+
+def replay(events, until=None):
+    """从开局事件起按顺序折叠出存档状态 (bets 是 Bet 列表)；until 给了就停在这个版本号"""
+    data = None
+    for ev in events:
+        if until is not None and ev["v"] > until: break
+        kind = ev["e"]
+        if kind == "init":  # 下面会就地改 users / vault，先拷一层，同一批事件可以反复重放
+            data = {k: dict(v) if isinstance(v, dict) else v for k, v in ev["state"].items()}
+            data["bets"] = _row_bets(data.get("bets", []))
+        elif kind == "bets":
+            data["bets"].extend(_row_bets(ev["rows"]))
+        else:
+            for k, v in ev.get("set", {}).items():
+                data[k] = _row_bets(v) if k == "bets" else dict(v) if isinstance(v, dict) else v
+            for k in ev.get("unset", ()):
+                data.pop(k, None)
+            for k, v in ev.get("merge", {}).items():
+                data.setdefault(k, {}).update(v)
+            for k, gone in ev.get("drop", {}).items():
+                for x in gone: data[k].pop(x, None)
+        data["version"] = ev["v"]
+    if data is not None: data.setdefault("logs", [])
+    return data
+
+# ==========================================
+# 🧊 进程内共享状态 (所有会话共用一份只读快照)
+# ==========================================
+# 每个会话每次 rerun 都 json.load 一遍存档太贵。Store 在进程里只保留一份解析好的快照，
+# 只有文件的 (inode, mtime, size) 变了才重新读档，自己写入时直接换上新快照，
+# N 个会话同时刷新也只在数据变化时解析一次。
+# 快照是所有会话共享的，所以做成只读：要改数据请走 STORE.update() / STORE.append_bet()。
+
+class FrozenDict(dict):
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("快照是只读的，请通过 STORE.update() 修改")
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+class FrozenList(list):
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("快照是只读的，请通过 STORE.update() 修改")
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+def freeze(v):
+    if isinstance(v, (FrozenDict, FrozenList)): return v  # 已经冻结的内容可以直接共用
+    if isinstance(v, dict): return FrozenDict((k, freeze(x)) for k, x in v.items())
+    if isinstance(v, list): return FrozenList(freeze(x) for x in v)
+    return v
+
+def thaw(v):
+    """只读快照 -> 普通 dict / list 的可写副本"""
+    if isinstance(v, dict): return {k: thaw(x) for k, x in v.items()}
+    if isinstance(v, list): return [thaw(x) for x in v]
+    return v
+
+# ------------------------------------------
+# 📇 当前局注单的派生索引
+# ------------------------------------------
+# 跟快照一起发布 (snap.index)：整份读档时从 bets 重建一次，
+# 之后每追加一注只做几次字典加法，页面上查奖池 / 赔率都是字典读取，不再扫描注单。
+# 追加时先 copy() 再改，旧快照上的索引保持不变，和旧快照的 bets 始终对得上。
+
+# 单个玩家本局的统计：注单在 bets 里的下标、已花积分、{盘口: 注数}
+PlayerStats = namedtuple("PlayerStats", "ids spent markets")
+NO_BETS = PlayerStats((), 0, {})
+
+class BetIndex:
+    __slots__ = ("pools", "totals", "players", "count")
+
+    def __init__(self):
+        self.pools = {}    # {盘口: {选项: 总金额}}
+        self.totals = {}   # {盘口: 总金额}
+        self.players = {}  # {玩家: PlayerStats}
+        self.count = 0     # 已索引的注单数，也就是下一注的下标
+
+    @classmethod
+    def build(cls, bets):
+        idx = cls()
+        for b in bets: idx.add(b)
+        return idx
+
+    def copy(self):
+        idx = BetIndex()
+        idx.pools = {m: dict(c) for m, c in self.pools.items()}
+        idx.totals = dict(self.totals)
+        idx.players = dict(self.players)  # PlayerStats 不可变，浅拷贝即可
+        idx.count = self.count
+        return idx
+
+    def add(self, b):
+        if b.__class__ is Bet: p, m, c, amt = b.player, b.market, b.choice, b.amount
+        else: p, m, c, amt = b["player"], b["market"], b["choice"], b["amount"]
+        pool = self.pools.setdefault(m, {})
+        pool[c] = pool.get(c, 0) + amt
+        self.totals[m] = self.totals.get(m, 0) + amt
+        # 玩家统计整条换新，代价只和这个玩家自己的注单数有关
+        me = self.players.get(p, NO_BETS)
+        markets = dict(me.markets)
+        markets[m] = markets.get(m, 0) + 1
+        self.players[p] = PlayerStats(me.ids + (self.count,), me.spent + amt, markets)
+        self.count += 1
+
+    def pool(self, market, choice):
+        return self.pools.get(market, {}).get(choice, 0)
+
+    def total(self, market):
+        return self.totals.get(market, 0)
+
+    def player(self, name):
+        return self.players.get(name, NO_BETS)
+
+# ------------------------------------------
+# 🏆 排行榜 (按金库分数排好序的玩家)
+# ------------------------------------------
+# 排名用有序容器维护，键是 (-分数, 玩家名)：前 N 名是切片，查某人名次是二分，都是 O(log n)。
+# 结算后只把分数变了的玩家删掉再按新分数插回去，不用每次把整个金库重新排序。
+
+class _BisectList(list):
+    """sortedcontainers 不可用时的替代品：查找同样是二分，插入删除是 O(n)"""
+    def add(self, v): bisect.insort(self, v)
+    def remove(self, v): del self[bisect.bisect_left(self, v)]
+    def index(self, v): return bisect.bisect_left(self, v)
+    def copy(self): return _BisectList(self)
+
+class Ranking:
+    __slots__ = ("_scores", "_order")
+
+    def __init__(self, vault=()):
+        self._scores = dict(vault)
+        items = sorted((-v, k) for k, v in self._scores.items())
+        self._order = SortedList(items) if SortedList else _BisectList(items)
+
+    def updated(self, vault):
+        """
+        按新金库返回排名，旧快照上的排名不受影响。
+        分数都没变 (下注、封盘这类提交) 直接复用自己，有变化才复制一份再改。
+        """
+        changed = [(k, v) for k, v in vault.items() if self._scores.get(k) != v]
+        gone = [k for k in self._scores if k not in vault]
+        if not changed and not gone: return self
+        new = Ranking.__new__(Ranking)
+        new._scores, new._order = dict(self._scores), self._order.copy()
+        for k, v in changed:
+            old = new._scores.get(k)
+            if old is not None: new._order.remove((-old, k))
+            new._order.add((-v, k))
+            new._scores[k] = v
+        for k in gone:
+            new._order.remove((-new._scores.pop(k), k))
+        return new
+
+    def __len__(self):
+        return len(self._order)
+
+    def rows(self, start, stop):
+        """第 start+1 ~ stop 名：[(名次, 玩家, 分数)]"""
+        start, stop = max(start, 0), min(stop, len(self._order))
+        return [(start + i + 1, k, -s) for i, (s, k) in enumerate(self._order[start:stop])]
+
+    def rank(self, player):
+        """名次 (从 1 开始)，不在金库里返回 None"""
+        if player not in self._scores: return None
+        return self._order.index((-self._scores[player], player)) + 1
+
+# ------------------------------------------
+# 📈 赔率走势 (每个盘口一个定长缓冲)
+# ------------------------------------------
+# 每进来一注就记下这个盘口当时各选项的奖池。一个盘口最多留 ODDS_HISTORY_SIZE 个点：
+# 写满后隔一个删一个，之后每 2 注才记一个点，再满再减半……
+# 所以不管一局下多少注，内存都有上限，而且整局的走势都在 (越早的点越稀)。
+# 走势是从注单流水推出来的：bets 按提交顺序只追加，这里记住处理到第几注，
+# 每次只补新增的部分；换局 (或存档被重置) 就从头开始。
+
+ODDS_HISTORY_SIZE = 120
+
+class OddsSeries:
+    __slots__ = ("points", "stride", "count", "last")
+
+    def __init__(self):
+        self.points = []  # [(时间戳, {选项: 奖池})]
+        self.stride = 1   # 每隔几注记一个点
+        self.count = 0
+        self.last = None  # 最新一注之后的奖池，画图时补在最后，曲线总是画到当前
+
+    def add(self, point, size):
+        self.count += 1
+        self.last = point
+        if self.count % self.stride: return
+        self.points.append(point)
+        if len(self.points) >= size:
+            del self.points[::2]  # 留下的正好是 stride 翻倍后该记的那些点
+            self.stride *= 2
+
+    def snapshot(self):
+        if self.last is None: return []
+        return self.points if self.points and self.points[-1] is self.last else [*self.points, self.last]
+
+class OddsHistory:
+    def __init__(self, size=ODDS_HISTORY_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, key):
+        self.key = key     # (局数, 第一注的时间戳)：变了说明换局或者存档被重置
+        self.seen = 0      # 已经处理到第几注
+        self.pools = {}    # {盘口: {选项: 奖池}}，当前累计
+        self.series = {}   # {盘口: OddsSeries}
+
+    @classmethod
+    def build(cls, bets, round_no=None, size=ODDS_HISTORY_SIZE):
+        """从一整局注单 (比如归档里的) 重建走势"""
+        h = cls(size)
+        h.feed(round_no, bets)
+        return h
+
+    def feed(self, round_no, bets):
+        key = (round_no, _bet_time(bets[0]) if bets else None)
+        with self._lock:
+            if key != self.key: self._reset(key)
+            for b in bets[self.seen:]:  # 比记录旧的快照 (len < seen) 什么都不做
+                if b.__class__ is Bet: m, c, amt = b.market, b.choice, b.amount
+                else: m, c, amt = b["market"], b["choice"], b["amount"]
+                pool = self.pools.setdefault(m, {})
+                pool[c] = pool.get(c, 0) + amt
+                self.series.setdefault(m, OddsSeries()).add((_bet_time(b), dict(pool)), self.size)
+            self.seen = max(self.seen, len(bets))
+
+    def points(self, market):
+        """[(时间戳, {选项: 奖池})]，按时间先后"""
+        with self._lock:
+            s = self.series.get(market)
+            return list(s.snapshot()) if s else []
+
+    def rows(self):
+        """导出用：每个点每个选项一行 (时间戳, 盘口, 选项, 奖池, 盘口总池)"""
+        with self._lock:
+            out = []
+            for m, s in self.series.items():
+                for t, pools in s.snapshot():
+                    total = sum(pools.values())
+                    out.extend((t, m, c, v, total) for c, v in pools.items())
+            return out
+
+def _bet_time(b):
+    return b.timestamp if b.__class__ is Bet else b.get("timestamp")
+
+class Store:
+    def __init__(self, backend, new_game):
+        self.backend = backend
+        self.new_game = new_game  # 存档不存在时用它生成初始数据
+        self._lock = threading.RLock()
+        self._held = threading.local()  # 本线程是否已持有跨进程锁 (flock 不可重入)
+        self._snap = None
+        self._stamp = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self.archive = RoundArchive(backend.archive_dir())
+        self.events = EventLog(backend.events_path())
+        self.odds = OddsHistory()
+
+    def _publish(self, snap, stamp):
+        if not hasattr(snap, "index"): snap.index = BetIndex.build(snap.get("bets", []))
+        vault = snap.get("vault")
+        if isinstance(vault, FrozenDict) and not hasattr(vault, "ranking"): vault.ranking = Ranking(vault)
+        self._snap, self._stamp = snap, stamp
+
+    def _fresh(self):
+        return self._snap is not None and self.backend.stamp(self._snap) == self._stamp
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if getattr(self._held, "depth", 0):
+                self._held.depth += 1
+                try:
+                    yield
+                finally:
+                    self._held.depth -= 1
+                return
+            with self.backend.lock():
+                self._held.depth = 1
+                try:
+                    yield
+                finally:
+                    self._held.depth = 0
+
+    def snapshot(self):
+        """当前状态的只读快照；文件没变就直接复用"""
+        if self._fresh(): return self._snap
+        with self._lock:
+            if self._fresh(): return self._snap
+            if not self.backend.exists():
+                with self._write_lock():
+                    if not self.backend.exists() and not self._recover():
+                        data = self.new_game()
+                        data.setdefault("version", 0)
+                        self.backend.save(data)
+                        self.events.append([init_event(data)], truncate=True)
+            # 读档前后各取一次文件戳，读的过程中有人写入就重读，保证快照和戳对得上
+            ref = self._snap
+            for _ in range(3):
+                before = self.backend.stamp(ref)
+                data = self._load()
+                after = self.backend.stamp(data)
+                if before == after: break
+                ref = data
+            else:
+                after = None  # 一直在被写，下次访问再读
+            self._publish(freeze(data), after)
+            if data.get("logs"): self.update(lambda d: None)  # 旧存档：把快照里的日志迁到分段里
+            return self._snap
+
+    def version(self):
+        return self.snapshot().get("version", 0)
+
+    def _latest(self):
+        """
+        写锁里取提交的基准。快照是否最新不能靠文件戳判断，
+        要和存档里已提交的版本号核对，对不上就强制重读。
+        """
+        cur = self.snapshot()
+        if cur.get("version", 0) != self.backend.version():
+            self._snap = self._stamp = None
+            cur = self.snapshot()
+        return cur
+
+    # ------------------------------------------
+    # 🧾 事件流水 / 启动时自动恢复
+    # ------------------------------------------
+
+    def _load(self):
+        try:
+            return self.backend.load()
+        except DAMAGED:
+            with self._write_lock():
+                self._recover()
+                try:
+                    return self.backend.load()  # 恢复过了，或者别的进程刚恢复过
+                except DAMAGED as e:
+                    raise DamagedStore(self.backend.path, self.events.path, e) from e
+
+    def _recover(self):
+        """
+        存档读不出来 (写坏了 / 被删了) 就把事件流水重放一遍，写成新存档，坏文件挪到一边。
+        调用时持有写锁；存档其实能读 (别的进程刚恢复过) 或者流水不完整时返回 False。
+        """
+        if self.backend.exists():
+            try:
+                self.backend.load()
+                return False
+            except DAMAGED:
+                pass
+        if not self.events.complete(): return False
+        data = replay(self.events.read(latest=True))
+        self.backend.quarantine()
+        self.backend.save(data)
+        self._snap = self._stamp = None
+        return True
+
+    def _record(self, cur, events):
+        """
+        提交写盘之后追加事件；旧存档第一次记事件时先补一条开局事件 (提交前的完整状态)。
+        存档已经提交了，这里失败不能再往上抛：只记日志，并把流水标成不完整，以后不拿它恢复存档。
+        """
+        try:
+            if not self.events.exists(): events = [init_event(cur), *events]
+            self.events.append(events)
+        except Exception:
+            version = events[-1]["v"]
+            log.exception("存档已提交，事件流水追加失败 (version %s)", version)
+            try:
+                self.events.mark_gap(version)
+            except Exception:
+                log.exception("事件流水漏记标记写入失败 (version %s)", version)
+
+    def replay_events(self, until=None):
+        """按事件流水重放出的状态 (可以停在某个版本号)，和线上存档对账、回滚都从这里出发"""
+        return replay(self.events.read(latest=until is None), until)
+
+    # ------------------------------------------
+    # ✍️ 乐观并发提交 (版本号 CAS)
+    # ------------------------------------------
+    # 每次提交 version +1。修改先在锁外基于读到的快照算好，
+    # 只有 "比较版本 + 写盘" 这一小段持有写锁 (进程内锁 + 跨进程锁文件)。
+    # 版本没变就直接写入；变了说明别人抢先提交了，就在最新状态上重放这次的增量
+    # (一注追加 / 一个 fn)，而不是拿旧数据把别人的提交覆盖掉。
+
+    def update(self, fn):
+        """fn(data) 就地修改可写副本，冲突时会在最新状态上再执行一次，所以 fn 不要有副作用"""
+        base = self.snapshot()
+        data = thaw(base)
+        result = fn(data)
+        with self._write_lock():
+            cur = self._latest()
+            if cur.get("version", 0) != base.get("version", 0):
+                data = thaw(cur)
+                result = fn(data)
+            data["version"] = cur.get("version", 0) + 1
+            self._flush_logs(cur, data)
+            settled = self._flush_archive(cur, data)
+            self.backend.save(data, cur)
+            # 已经提交了：之后的步骤失败只记日志，不能让调用方 (比如后台结算) 以为没保存而重做一遍
+            self._record(cur, [diff_event(cur, data, settled)])
+            try:
+                new = freeze(data)
+                if "vault" in new:  # 排行榜只重排分数变了的玩家
+                    new["vault"].ranking = self.ranking(cur.get("vault", {})).updated(new["vault"])
+                self._publish(new, self.backend.stamp(data))
+            except Exception:
+                log.exception("存档已提交，发布新快照失败 (version %s)", data["version"])
+                self._snap = self._stamp = None
+        return result
+
+    def _flush_logs(self, cur, data):
+        """
+        fn 往 data["logs"] 里追加的行存成一个新的日志分段 (编号 = 这次提交的版本号)，
+        快照里的 logs 清空。旧存档快照里残留的日志整体迁移到 0 号分段。
+        分段记在提交前那一局名下；重新结算已归档的局 (archive 里带 round) 就记在被更正的那一局名下。
+        """
+        old = cur.get("logs", [])
+        if old: self.backend.append_log(0, None, list(old))
+        lines = data.get("logs", [])[len(old):]
+        round_no = (data.get("archive") or {}).get("round", cur.get("round"))
+        if lines: self.backend.append_log(data["version"], round_no, list(lines))
+        data["logs"] = []
+
+    def _flush_archive(self, cur, data):
+        """
+        结算的 fn 在 data["archive"] 里放 {results, payouts, markets, house_odds}：这里把提交前那一局的全部注单
+        连同结果、派彩和结算用的盘口配置、赔率写成归档文件，再把这个临时字段去掉，不进存档。
+        重新结算已归档的局时再带上 round：注单、结算时间和配置沿用原归档，只换结果和派彩。
+        """
+        settled = data.pop("archive", None)
+        if settled is None: return None
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        amend = settled.get("round")
+        if amend is not None:
+            old = self.archive.read(amend)
+            round_no, bets, extra = amend, old["bets"], {"settled_at": old.get("settled_at"), "amended_at": now}
+            source = old
+        else:
+            round_no, bets, extra = cur["round"], list(cur.get("bets", [])), {"settled_at": now}
+            source = settled
+        config = {k: thaw(source[k]) for k in ("markets", "house_odds") if source.get(k) is not None}
+        settled = {"results": dict(settled["results"]), "payouts": {p: float(v) for p, v in settled["payouts"].items()}}
+        self.archive.write(round_no, bets, settled["results"], settled["payouts"], config, **extra)
+        if amend is not None: settled["round"] = amend
+        return settled
+
+    # ------------------------------------------
+    # 🗄️ 历史局 (结算时归档)
+    # ------------------------------------------
+
+    def archived_rounds(self):
+        """[{round, file, bets, pool, players, results, settled_at}]，按局数排列"""
+        return self.archive.rounds()
+
+    def archived_round(self, round_no):
+        """某一局归档的 {round, results, payouts, bets}；没有返回 None"""
+        return self.archive.read(round_no)
+
+    # ------------------------------------------
+    # 📜 历史日志 (按结算分段存储)
+    # ------------------------------------------
+
+    def log_chunks(self):
+        """[(分段号, 局数, 行数)]，按时间先后"""
+        return self.backend.log_chunks()
+
+    def read_log(self, chunk):
+        return self.backend.read_log(chunk)
+
+    def search_logs(self, text, limit=200):
+        """[(局数, 日志行)]，新的在前，最多 limit 条；逐段扫描，不把全部日志读进内存"""
+        return self.backend.search_logs(text, limit)
+
+    # ------------------------------------------
+    # 🚚 组提交 (后台写盘线程)
+    # ------------------------------------------
+    # 下注由一个后台线程统一落盘：会话把注单丢进队列后等待，
+    # 写盘线程把 GROUP_COMMIT_WINDOW 内到达的注单攒成一批，逐个在最新状态上校验，
+    # 再一次 write + fsync 写入，最后唤醒这一批的所有会话。
+    # 封盘前的下注高峰因此只需要少量几次刷盘。
+
+    def append_bet(self, bet, check=None, limit=None):
+        """
+        追加一注，阻塞到这一注落盘为止。check(快照) 返回错误信息则拒绝下注；
+        limit(快照) 返回这一注最多能押的金额 (None 不限，0 拒绝)，押多了会直接把 bet["amount"] 改小。
+        """
+        if check or limit:  # 先在锁外快速拒绝明显不合法的
+            snap = self.snapshot()
+            err = check(snap) if check else None
+            if not err and limit and limit(snap) == 0: err = LIMIT_ERROR
+            if err: return err
+        item = _PendingBet(bet, check, limit)
+        self._ensure_writer()
+        self._queue.put(item)
+        if not item.done.wait(30):
+            return "提交超时，请刷新后确认是否已下注"
+        return item.error
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name="bet-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + GROUP_COMMIT_WINDOW
+            while True:
+                left = deadline - time.monotonic()
+                if left <= 0: break
+                try:
+                    batch.append(self._queue.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                self._commit_bets(batch)
+            except Exception as e:  # 拿锁 / 读档 / 复核时就失败了：这一批一注都没写
+                log.exception("组提交失败")
+                self._fail(batch, e)
+            for item in batch:
+                item.done.set()
+
+    def _fail(self, batch, e):
+        """这一批没写进存档：被复核拒绝的保留原因，其余的都报保存失败"""
+        self._snap = self._stamp = None  # 下次重新读档
+        for item in batch:
+            if not item.error: item.error = f"保存失败: {e}"
+
+    def _commit_bets(self, batch):
+        with self._write_lock():
+            cur = self._latest()
+            # 新快照只在本线程里逐注补齐，整批写完才发布出去
+            bets = FrozenList(cur["bets"])
+            new = FrozenDict(cur)
+            dict.__setitem__(new, "bets", bets)
+            new.index = cur.index.copy()
+            accepted = []
+            for item in batch:
+                item.error = item.check(new) if item.check else None
+                room = item.limit(new) if item.limit and not item.error else None
+                if room == 0: item.error = LIMIT_ERROR
+                if item.error: continue
+                if room is not None: item.bet["amount"] = room  # 按上限截断
+                bet = freeze(to_bet(item.bet))
+                list.append(bets, bet)
+                new.index.add(bet)
+                accepted.append(item.bet)
+            if not accepted: return
+            try:
+                self.backend.append_bets(cur, accepted)
+            except Exception as e:
+                log.exception("注单写盘失败")
+                return self._fail(batch, e)
+            # 注单已经落盘：之后的步骤失败只记日志，不能告诉玩家 "保存失败" 让他重下一遍
+            dict.__setitem__(new, "version", cur.get("version", 0) + len(accepted))
+            self._record(cur, [bets_event(new["version"], bets[len(cur["bets"]):])])
+            try:
+                self._publish(new, self.backend.stamp(new))
+            except Exception:
+                log.exception("注单已保存，发布新快照失败 (version %s)", new["version"])
+                self._snap = self._stamp = None
+
+    def remove(self):
+        with self._write_lock():
+            self.backend.remove()
+            self.archive.rotate()  # 历史局归档只挪走不删，统计库以后还能补导
+            self.events.remove()
+            self._snap = self._stamp = None
+
+    def player_bets(self, data, player):
+        bets = data["bets"]
+        return [bets[i] for i in self.index(data).player(player).ids]
+
+    def player_stats(self, data, player):
+        """PlayerStats(ids, spent, markets)：余额、盘口数检查都是 O(1)"""
+        return self.index(data).player(player)
+
+    def index(self, data):
+        """快照自带增量维护的索引；自己拼出来的 dict 就现算一份"""
+        idx = getattr(data, "index", None)
+        return idx if idx is not None else BetIndex.build(data["bets"])
+
+    def odds_history(self, data):
+        """本局的赔率走势：进程内维护，每次按快照里新增的注单补齐"""
+        self.odds.feed(data["round"], data["bets"])
+        return self.odds
+
+    def ranking(self, vault):
+        """金库对应的排名；快照 / section("vault") 拿到的金库上已经挂好了"""
+        ranking = getattr(vault, "ranking", None)
+        return ranking if ranking is not None else Ranking(vault)
+
+    def section(self, name):
+        """
+        只取一块数据：meta (round / is_locked 等) / users / vault。
+        快照没过期就直接从快照里拿；过期了也只读这一块，不去解析整局注单。
+        """
+        if not self._fresh() and not self.backend.exists(): self.snapshot()  # 还没有存档就先开局
+        if self._fresh(): return self._snap if name == "meta" else self._snap[name]
+        try:
+            value = freeze(self.backend.load_section(name))
+        except DAMAGED:  # 存档坏了：走整份读档，那里会用事件流水恢复
+            snap = self.snapshot()
+            return snap if name == "meta" else snap[name]
+        if name == "vault" and not hasattr(value, "ranking"): value.ranking = Ranking(value)
+        return value
+
+class _PendingBet:
+    __slots__ = ("bet", "check", "limit", "error", "done")
+
+    def __init__(self, bet, check, limit=None):
+        self.bet, self.check, self.limit = bet, check, limit
+        self.error = None
+        self.done = threading.Event()
@@ -0,0 +1,241 @@
+import json
+
+import streamlit as st
+import pandas as pd
+from streamlit.errors import StreamlitAPIException
+
+import bet_analytics
+import bet_engine
+
+# ==========================================
+# 🧩 公共页面片段 (st.fragment)
+# ==========================================
+# 排行榜、历史日志在每个前端都一样，做成独立片段：
+# 片段自己读快照、自己重跑，页面其它地方的点击 (下注、切换选项) 不会重画它们。
+
+def rerun_fragment():
+    """只重跑当前片段；片段是随整页一起跑的 (不是自己触发的重跑) 时退回整页重跑"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def flash(msg, icon="✅"):
+    """
+    操作成功的提示：先记在会话里，st.rerun() 之后的下一次渲染再用 st.toast 弹出。
+    处理函数里不用 sleep 等用户看清提示，点击后脚本线程立刻释放。
+    """
+    st.session_state.setdefault("flash", []).append((msg, icon))
+
+def show_flash():
+    """页面 (或片段) 开头调用，弹出上一次操作留下的提示"""
+    for msg, icon in st.session_state.pop("flash", []):
+        st.toast(msg, icon=icon)
+
+def damaged_page(err):
+    """存档坏了又恢复不了 (bet_store.DamagedStore)：停在说明页，不带着空数据往下跑"""
+    st.error(f"💥 {err}")
+    st.markdown(f"坏掉的存档原样留在 `{err.path}`，没有被改动或覆盖。")
+    if err.quarantined:
+        st.markdown("之前自动恢复时挪开的坏文件：\n" + "\n".join(f"- `{p}`" for p in err.quarantined))
+    st.info(f"请从备份恢复 `{err.path}`，或补全事件流水 `{err.events}` 后刷新页面；恢复成功前所有页面都停在这里。")
+    st.stop()
+
+def start_settlement(store, work):
+    """管理员点结算：交给后台线程 (bet_engine.start_settlement)，记下任务号等它结束时提示"""
+    st.session_state.settle_job = bet_engine.start_settlement(store, work).id
+
+def settlement_status(store, poll=0.5):
+    """后台结算的进度条；结算进行中时片段每 poll 秒自己刷新，不占用整页"""
+    job = bet_engine.settlement_job(store)
+    if job is None: return
+    st.fragment(_settlement_progress, run_every=poll if job.state == "running" else None)(store)
+
+def _settlement_progress(store):
+    job = bet_engine.settlement_job(store)
+    if job.state == "running":
+        st.progress(job.progress, text=f"⏳ 第 {job.round} 局结算中: {job.message}")
+    elif st.session_state.get("settle_job") == job.id:  # 只提示发起结算的会话，且只提示一次
+        del st.session_state.settle_job
+        if job.state == "done": flash(f"第 {job.round} 局结算完成")
+        else: flash(f"结算失败: {job.error}", "❌")
+        st.rerun()  # 整页换成结算后的新一局
+
+@st.fragment
+def exposure_panel(store, market_config, house_odds, title="🏦 庄家风险敞口"):
+    """PVE 盘口每个选项开出时庄家要赔多少，以及每个选项的净赔上限设置；只读索引里的累计值"""
+    show_flash()  # 片段自己重跑时弹出保存提示
+    st.subheader(title)
+    data = store.snapshot()
+    cap, trim = data.get("exposure_cap"), data.get("exposure_trim", True)
+    with st.form("exposure_cap"):
+        c1, c2, c3 = st.columns([2, 2, 1], vertical_alignment="bottom")
+        new_cap = c1.number_input("单个选项净赔上限 (0 = 不限)", 0, value=int(cap or 0), step=500)
+        new_trim = c2.radio("超限时", ["截断到上限", "直接拒绝"], index=0 if trim else 1, horizontal=True) == "截断到上限"
+        if c3.form_submit_button("保存"):
+            def set_cap(d):
+                d["exposure_cap"] = new_cap or None
+                d["exposure_trim"] = new_trim
+            store.update(set_cap)
+            flash("赔付上限已保存")
+            rerun_fragment()
+
+    rows = bet_engine.exposure(store.index(data), market_config, house_odds)
+    if not any(r.stake for r in rows):
+        st.caption("PVE 盘口暂无下注")
+        return
+    df = pd.DataFrame([(r.market, r.option, r.stake, r.liability, r.net) for r in rows],
+                      columns=["盘口", "选项", "押注", "开出时赔付", "庄家净赔"])
+    if cap: df["剩余额度"] = [cap - r.net for r in rows]
+    st.dataframe(df.style.format(precision=1).highlight_max(subset=["庄家净赔"], color="#ffcdd2"),
+                 hide_index=True, use_container_width=True)
+
+@st.fragment
+def what_if_panel(store, market_config, house_odds=1.0, title="🔮 结算试算 (所有结果组合)"):
+    """
+    结算前看每种结果组合会发多少钱。展开才计算；注单版本号、盘口配置 (按内容比较，
+    热更新后会变) 和赔率都没变就只算一次，之后排序、翻页只是表格交互，不会重新算。
+    """
+    box = st.expander(title, key="what_if", on_change="rerun")
+    if not box.open: return
+    with box:
+        key = (store.version(), house_odds, json.dumps(market_config, ensure_ascii=False, sort_keys=True))
+        cached = st.session_state.get("what_if_cache")
+        if cached is None or cached[0] != key:
+            data = store.snapshot()
+            w = bet_engine.what_if(data["bets"], market_config, house_odds)
+            cols = {m: [bet_engine.market_options(market_config[m])[k] for k in w.choices[:, i]]
+                    for i, m in enumerate(w.markets)}
+            df = pd.DataFrame({**cols, "总派彩": w.payout, "庄家PVE净赔": w.pve_net,
+                               "最大赢家": w.top_player, "赢家收益": w.top_profit})
+            cached = st.session_state.what_if_cache = (key, df, len(data["bets"]))
+        _, df, n = cached
+        st.caption(f"{len(df)} 种组合 · 基于当前 {n} 注 · 点表头排序")
+        st.dataframe(df, hide_index=True, use_container_width=True,
+                     column_config={k: st.column_config.NumberColumn(format="%.1f")
+                                    for k in ("总派彩", "庄家PVE净赔", "赢家收益")})
+
+@st.fragment
+def resettle_panel(store, markets, house_odds=1.0, log=None, fix=None, title="🛠️ 重新结算 (更正结果)"):
+    """
+    已结算的局填错了结果时用：选一局、改几个盘口的结果，只重算这几个盘口的派彩差额。
+    盘口配置和赔率以归档里记下的结算时配置为准；markets(局数) / house_odds 只给没记配置的旧归档用。
+    log / fix 原样交给 bet_engine.resettle
+    """
+    box = st.expander(title, key="resettle", on_change="rerun")
+    if not box.open: return
+    with box:
+        rounds = store.archived_rounds()
+        if not rounds:
+            st.caption("还没有结算过的局")
+            return
+        entry = st.selectbox("局", rounds[::-1], key="resettle_round",
+                             format_func=lambda e: f"第 {e['round']} 局 ({e.get('amended_at') or e.get('settled_at', '')})")
+        round_no = entry["round"]
+        doc = store.archived_round(round_no) or {}
+        config = doc.get("markets") or markets(round_no)
+        with st.form(f"resettle_{round_no}"):
+            cols = st.columns(3)
+            picked = {}
+            for i, (m, old) in enumerate(entry["results"].items()):
+                opts = list(bet_engine.market_options(config[m])) if m in config else [old]
+                if old not in opts: opts.append(old)
+                picked[m] = cols[i % 3].selectbox(m, opts, index=opts.index(old), key=f"resettle_{round_no}_{m}")
+            if st.form_submit_button("🛠️ 按新结果重新结算", type="primary"):
+                try:
+                    r = bet_engine.resettle(store, round_no, picked, config, house_odds, log, fix)
+                except (RuntimeError, ValueError) as e:
+                    st.error(str(e))
+                    return
+                if not r.changed:
+                    st.info("结果没有变化")
+                    return
+                bet_analytics.Analytics().drop_round(bet_analytics.event_name(store), round_no)
+                flash(f"第 {round_no} 局已重新结算: {len(r.changed)} 个盘口, {len(r.delta)} 名玩家金库变动")
+                st.rerun()
+
+@st.fragment
+def leaderboard(store, admin=None, column="金库", title="🏆 排行榜", user=None, top_n=10):
+    """
+    前 N 名 + 我的名次和前后邻居。排名是 store 里随结算增量维护的有序容器，
+    这里只取切片、二分查名次，不对整个金库排序；也只读金库这一块，不碰注单。
+    """
+    ranking = store.ranking(store.section("vault"))
+    st.subheader(title)
+    if not len(ranking): return
+
+    n = top_n
+    if len(ranking) > top_n:
+        n = st.selectbox("显示前", [top_n, 50, 100, "全部"], key="rank_top_n",
+                         format_func=lambda v: v if v == "全部" else f"{v} 名")
+    rows = ranking.rows(0, len(ranking) if n == "全部" else n)
+    _rank_table(rows, admin, column)
+
+    me = ranking.rank(user) if user and user != admin else None
+    if me:
+        st.caption(f"📍 你的名次: 第 {me} 名 / 共 {len(ranking)} 人")
+        if me > len(rows):  # 不在上面的表里，单独列出前后邻居
+            _rank_table(ranking.rows(me - 3, me + 2), admin, column)
+
+def _rank_table(rows, admin, column):
+    rows = [r for r in rows if r[1] != admin]
+    if not rows: return
+    df = pd.DataFrame([(p, v) for _, p, v in rows], columns=["玩家", column],
+                      index=[r for r, _, _ in rows])
+    st.dataframe(df, use_container_width=True)
+
+@st.fragment
+def log_viewer(store, title="📜 历史日志"):
+    """
+    日志按结算分段存储，一页就是一个分段 (一局)，新的在前。
+    折叠时什么都不读；展开后也只读当前这一页，搜索交给 store 逐段扫描。
+    """
+    box = st.expander(title, key="log_viewer", on_change="rerun")
+    if not box.open: return
+    with box:
+        q = st.text_input("🔍 搜索日志", key="log_search", placeholder="玩家名 / 盘口 / 结果")
+        if q:
+            hits = store.search_logs(q)
+            st.caption(f"找到 {len(hits)} 条" + (" (只显示最近的)" if len(hits) >= 200 else ""))
+            if hits:
+                st.text("\n".join(f"[{_round_label(r)}] {l}" for r, l in hits))
+            return
+
+        chunks = store.log_chunks()[::-1]
+        if not chunks:
+            st.caption("暂无日志")
+            return
+        page = st.selectbox("页", range(len(chunks)), key="log_page",
+                            format_func=lambda i: f"{i + 1}/{len(chunks)} · {_round_label(chunks[i][1])} ({chunks[i][2]} 行)")
+        st.text("\n".join(store.read_log(chunks[page][0])))
+
+def _round_label(round_no):
+    return "更早的日志" if round_no is None else f"第 {round_no} 局"
+
+@st.fragment
+def analytics_panel(store, title="📊 跨赛事统计"):
+    """
+    管理员看的胜率 / ROI / 盘口人气。展开时先把新结算的局导出到列式统计库，
+    再按需查询；折叠时什么都不读。
+    """
+    box = st.expander(title, key="analytics_panel", on_change="rerun")
+    if not box.open: return
+    with box:
+        db = bet_analytics.Analytics()
+        n = db.sync(store)
+        if n: st.caption(f"已导出 {n} 局新结算的数据")
+        events = db.events()
+        if not events:
+            st.caption("暂无已结算的数据")
+            return
+        event = st.selectbox("赛事", ["全部", *events], key="analytics_event")
+        event = None if event == "全部" else event
+        t1, t2, t3 = st.tabs(["玩家", "盘口", "每局"])
+        with t1:
+            df = db.player_stats(event=event)
+            st.dataframe(df.style.format({"胜率": "{:.0%}", "ROI": "{:+.0%}", "派彩": "{:.1f}"}),
+                         use_container_width=True)
+        with t2:
+            st.dataframe(db.market_stats(event=event).style.format({"人气": "{:.0%}"}), use_container_width=True)
+        with t3:
+            st.dataframe(db.round_stats(event=event), use_container_width=True)
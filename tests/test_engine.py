@@ -0,0 +1,147 @@
+"""
+结算引擎的行为测试：向量化结算和以前 "逐个盘口筛注单、逐注发钱" 的写法在随机局面上结果一致，
+试算、重新结算、庄家敞口也都拿整局重算的结果对账。
+"""
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bet_engine
+import bet_store
+
+HOUSE_ODDS = 1.9
+
+def random_round(rng, n_bets=300, n_players=12):
+    """随机盘口配置 (PVP / PVE 混合) + 一局注单，少量注单押在已经下架的盘口上"""
+    config = {}
+    for i in range(rng.randint(2, 4)):
+        kind = rng.choice(["PVP", "PVE"])
+        config[f"盘口{i}"] = {"type": kind, "options": [f"选项{k}" for k in range(rng.randint(2, 3))]}
+    players = [f"玩家{i}" for i in range(n_players)]
+    bets = []
+    for _ in range(n_bets):
+        m = rng.choice(list(config) + ["下架盘口"] * (len(config) // 2))
+        opts = config[m]["options"] if m in config else ["甲", "乙"]
+        bets.append({"player": rng.choice(players), "market": m, "choice": rng.choice(opts),
+                     "amount": rng.randint(1, 20) * 10, "timestamp": 0})
+    results = {m: rng.choice(cfg["options"]) for m, cfg in config.items()}
+    return config, players, bets, results
+
+def settle_by_market(bets, results, config, house_odds, players=()):
+    """以前各前端的结算：每个盘口把注单筛一遍，算出赔率后逐注发钱"""
+    profits = {p: 0.0 for p in players}
+    for m, r in results.items():
+        rows = [b for b in bets if b["market"] == m]
+        pool = sum(b["amount"] for b in rows)
+        win_pool = sum(b["amount"] for b in rows if b["choice"] == r)
+        if config[m]["type"] == "PVE": ratio = house_odds
+        else: ratio = pool / win_pool if win_pool > 0 else 0.0
+        for b in rows:
+            if b["choice"] == r:
+                profits[b["player"]] = profits.get(b["player"], 0.0) + b["amount"] * ratio
+    return profits
+
+def assert_same(a, b):
+    keys = set(a) | set(b)
+    for k in keys:
+        assert a.get(k, 0.0) == pytest.approx(b.get(k, 0.0)), k
+
+@pytest.mark.parametrize("seed", range(20))
+def test_settle_round_matches_per_market_loop(seed):
+    rng = random.Random(seed)
+    config, players, bets, results = random_round(rng)
+    profits, lines = bet_engine.settle_round(bets, results, config, HOUSE_ODDS, players)
+    assert set(players) <= set(profits)
+    assert_same(profits, settle_by_market(bets, results, config, HOUSE_ODDS, players))
+    # 存档里的 Bet 命名元组走按列转置的分支，结果必须一样
+    profits2, lines2 = bet_engine.settle_round([bet_store.to_bet(b) for b in bets], results, config, HOUSE_ODDS, players)
+    assert profits2 == profits and lines2 == lines
+
+def test_settle_round_without_markets():
+    bets = [{"player": "甲", "market": "盘口0", "choice": "a", "amount": 10, "timestamp": 0}]
+    assert bet_engine.settle_round(bets, {}, {}, HOUSE_ODDS, ["甲", "乙"]) == ({"甲": 0.0, "乙": 0.0}, [])
+    assert bet_engine.settle_round([], {"盘口0": "a"}, {"盘口0": {"options": ["a"]}}) == ({}, [])
+
+def test_settle_round_nobody_wins():
+    config = {"盘口0": {"type": "PVP", "options": ["a", "b"]}}
+    bets = [{"player": "甲", "market": "盘口0", "choice": "a", "amount": 10, "timestamp": 0}]
+    profits, lines = bet_engine.settle_round(bets, {"盘口0": "b"}, config)
+    assert profits == {"甲": 0.0}
+    assert lines == ["[盘口0] 结果: b", " -> 通杀"]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_what_if_matches_settle_round(seed):
+    rng = random.Random(seed)
+    config, players, bets, _ = random_round(rng, n_bets=120, n_players=6)
+    w = bet_engine.what_if(bets, config, HOUSE_ODDS, chunk=5)  # 分块小一点，跨块拼接也要对
+    markets = list(config)
+    combos = list(itertools.product(*(config[m]["options"] for m in markets)))
+    assert w.markets == markets and len(w.choices) == len(combos)
+    spent = {}
+    for b in bets: spent[b["player"]] = spent.get(b["player"], 0) + b["amount"]
+    pve_pool = sum(b["amount"] for b in bets if config.get(b["market"], {}).get("type") == "PVE")
+    for i, choice in enumerate(w.choices):
+        results = {m: config[m]["options"][k] for m, k in zip(markets, choice)}
+        profits = settle_by_market(bets, results, config, HOUSE_ODDS)
+        assert w.payout[i] == pytest.approx(sum(profits.values()))
+        pve = settle_by_market(bets, {m: r for m, r in results.items() if config[m]["type"] == "PVE"}, config, HOUSE_ODDS)
+        assert w.pve_net[i] == pytest.approx(sum(pve.values()) - pve_pool)
+        net = {p: profits.get(p, 0.0) - s for p, s in spent.items()}
+        assert w.top_profit[i] == pytest.approx(max(net.values()))
+        assert net[w.top_player[i]] == pytest.approx(w.top_profit[i])
+
+def test_what_if_without_bets():
+    config = {"盘口0": {"type": "PVP", "options": ["a", "b"]}, "盘口1": ["x", "y", "z"]}
+    w = bet_engine.what_if([], config)
+    assert len(w.choices) == 6
+    assert not w.payout.any() and not w.pve_net.any()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_resettle_delta_matches_full_resettle(seed):
+    rng = random.Random(seed)
+    config, players, bets, results = random_round(rng)
+    doc = {"round": 3, "results": results, "bets": [bet_store.to_bet(b) for b in bets],
+           "markets": config, "house_odds": HOUSE_ODDS}
+    corrections = {m: rng.choice(cfg["options"]) for m, cfg in config.items() if rng.random() < 0.6}
+    r = bet_engine.resettle_delta(doc, corrections, {}, 1.0)  # 归档里记了配置，传进来的不该被用上
+    before = settle_by_market(bets, results, config, HOUSE_ODDS)
+    after = settle_by_market(bets, {**results, **corrections}, config, HOUSE_ODDS)
+    assert r.round == 3
+    assert r.changed == {m: (results[m], c) for m, c in corrections.items() if results[m] != c}
+    assert_same(r.delta, {p: after.get(p, 0.0) - before.get(p, 0.0) for p in set(before) | set(after)})
+    if not r.changed: assert r.lines == []
+
+def test_resettle_delta_uses_fallback_config():
+    config = {"盘口0": {"type": "PVE", "options": ["a", "b"]}}
+    bets = [{"player": "甲", "market": "盘口0", "choice": "a", "amount": 10, "timestamp": 0}]
+    doc = {"round": 1, "results": {"盘口0": "b"}, "bets": bets}  # 旧归档：没记配置
+    r = bet_engine.resettle_delta(doc, {"盘口0": "a"}, config, 2.0)
+    assert r.delta == {"甲": 20.0}
+
+@pytest.mark.parametrize("house_odds, cap", [(1.9, 500), (3.0, 2000), (2.5, -200)])
+def test_exposure_room_reaches_cap(house_odds, cap):
+    rng = random.Random(7)
+    index = bet_store.BetIndex.build(
+        {"player": f"p{i}", "market": "m", "choice": rng.choice("ab"), "amount": rng.randint(1, 9) * 10, "timestamp": 0}
+        for i in range(40))
+
+    def net(option):
+        return index.pool("m", option) * house_odds - index.total("m")
+
+    room = bet_engine.exposure_room(index, "m", "a", house_odds, cap)
+    if net("a") >= cap:
+        assert room == 0
+        return
+    index.add({"player": "x", "market": "m", "choice": "a", "amount": room, "timestamp": 0})
+    assert net("a") == pytest.approx(cap)
+
+def test_exposure_room_unbounded_without_margin():
+    index = bet_store.BetIndex.build([{"player": "p", "market": "m", "choice": "a", "amount": 100, "timestamp": 0}])
+    assert bet_engine.exposure_room(index, "m", "a", 1.0, 0) is None
+    assert bet_engine.exposure_room(index, "m", "b", 0.8, 0) is None
@@ -0,0 +1,172 @@
+"""
+存档层的行为测试：注单按列编码可以无损还原，增量维护的排行榜和整表重排一致，
+事件流水重放出的状态和线上存档一模一样 (两种后端都测)。
+"""
+import json
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bet_engine
+import bet_store
+
+CONFIG = {"🏆 胜负": {"type": "PVP", "options": ["红队", "蓝队"]},
+          "🩸 一血": {"type": "PVE", "options": ["红队", "蓝队"]}}
+
+def new_game():
+    return {"round": 1, "is_locked": False, "users": {}, "vault": {}, "bets": [], "logs": [], "match_history": []}
+
+def random_bets(rng, n):
+    return [{"player": f"玩家{rng.randint(0, 9)}", "market": rng.choice(list(CONFIG)), "choice": rng.choice(["红队", "蓝队"]),
+             "amount": rng.randint(1, 20) * 10, "timestamp": round(rng.uniform(0, 1e9), 3)} for _ in range(n)]
+
+# ------------------------------------------
+# 📦 注单按列编码
+# ------------------------------------------
+
+def test_encode_decode_round_trip():
+    bets = [bet_store.to_bet(b) for b in random_bets(random.Random(1), 200)]
+    doc = json.loads(json.dumps(bet_store.encode_bets(bets)))  # 存档里是 JSON，过一遍序列化再解
+    assert doc["n"] == 200
+    assert len(doc["strings"]["player"]) <= 10
+    out = bet_store.decode_bets(doc)
+    assert out == bets
+    assert all(b.__class__ is bet_store.Bet for b in out)
+
+def test_encode_decode_keeps_odd_bets():
+    bets = [{"player": "甲", "market": "m", "choice": "a", "amount": 10, "timestamp": 1.5, "note": "补录"},
+            {"player": "乙", "market": "m", "choice": "b", "amount": 20, "timestamp": None, "note": None}]
+    assert [dict(b) for b in bet_store.decode_bets(bet_store.encode_bets(bets))] == bets
+    assert bet_store.decode_bets(bet_store.encode_bets([])) == []
+    assert bet_store.decode_bets([dict(bets[0])]) == [bets[0]]  # 旧存档：dict 列表
+
+# ------------------------------------------
+# 🏆 排行榜
+# ------------------------------------------
+
+def assert_ranking(ranking, vault):
+    expect = sorted(vault.items(), key=lambda kv: (-kv[1], kv[0]))
+    assert len(ranking) == len(vault)
+    assert ranking.rows(0, len(vault) + 5) == [(i + 1, k, v) for i, (k, v) in enumerate(expect)]
+    for i, (k, _) in enumerate(expect):
+        assert ranking.rank(k) == i + 1
+    assert ranking.rank("不存在的人") is None
+
+def test_ranking_incremental_updates():
+    rng = random.Random(3)
+    vault = {f"玩家{i}": float(rng.randint(0, 50) * 10) for i in range(40)}
+    ranking = bet_store.Ranking(vault)
+    assert_ranking(ranking, vault)
+    for _ in range(30):
+        old, old_vault = ranking, dict(vault)
+        for k in rng.sample(list(vault), 5):
+            vault[k] += rng.randint(-20, 20) * 10
+        if rng.random() < 0.3: vault.pop(rng.choice(list(vault)))
+        if rng.random() < 0.3: vault[f"新人{rng.randint(0, 999)}"] = 0.0
+        ranking = old.updated(vault)
+        assert_ranking(ranking, vault)
+        assert_ranking(old, old_vault)  # 旧快照上的排名不受影响
+    assert ranking.updated(dict(vault)) is ranking
+    assert ranking.rows(35, 100) == bet_store.Ranking(vault).rows(35, 100)
+
+# ------------------------------------------
+# 🧾 事件流水重放
+# ------------------------------------------
+
+def play(store, rng):
+    """注册、下注 (带复核)、封盘、结算、重新结算，每步之后重放都要和线上一致"""
+    def check_all():
+        live = bet_store.state_of(bet_store.thaw(store.snapshot()))
+        assert bet_store.state_of(store.replay_events()) == live
+
+    def register(name):
+        def fn(d):
+            d["users"][name] = "x"
+            d["vault"][name] = 0.0
+        return fn
+
+    for i in range(10):
+        store.update(register(f"玩家{i}"))
+    check_all()
+    for round_no in (1, 2):
+        for b in random_bets(rng, 60):
+            assert store.append_bet(b, bet_engine.bet_check(store, b["player"], b["amount"], round_no, 10 ** 6)) is None
+        check_all()
+        store.update(lambda d: d.update(is_locked=True))
+        results = {m: rng.choice(cfg["options"]) for m, cfg in CONFIG.items()}
+        snap = store.snapshot()
+        profits, lines = bet_engine.settle_round(snap["bets"], results, CONFIG, 1.9, list(snap["users"]))
+
+        def settle(d):
+            for p, v in profits.items():
+                d["vault"][p] = d["vault"].get(p, 0) + v
+            d["match_history"].append(results["🏆 胜负"])
+            d["archive"] = {"results": results, "payouts": profits, "markets": CONFIG, "house_odds": 1.9}
+            d["logs"].extend(lines)
+            d["bets"], d["is_locked"] = [], False
+            d["round"] += 1
+        store.update(settle)
+        check_all()
+    old = store.archived_round(1)["results"]["🏆 胜负"]
+    new = "蓝队" if old == "红队" else "红队"
+
+    def fix(d, r):
+        d["match_history"][r.round - 1] = r.changed["🏆 胜负"][1]
+    r = bet_engine.resettle(store, 1, {"🏆 胜负": new}, fix=fix)
+    assert r.changed == {"🏆 胜负": (old, new)}
+    assert store.archived_round(1)["results"]["🏆 胜负"] == new
+    assert store.snapshot()["match_history"][0] == new
+    chunk, round_no, _ = store.log_chunks()[-1]  # 第 3 局时更正第 1 局：日志记在第 1 局名下
+    assert round_no == 1 and store.read_log(chunk)[0] == "=== 第 1 局重新结算 ==="
+    check_all()
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_replay_matches_live_state(tmp_path, kind):
+    db_file = str(tmp_path / "game_data.json")
+    store = bet_store.Store(bet_store.open_backend(db_file, kind), new_game)
+    play(store, random.Random(5))
+    assert store.events.complete()
+    # 停在某个中间版本：和当时的存档一致 (第一局结算前的注单都还在)
+    events = store.events.read()
+    settle = next(ev for ev in events if ev["e"] == "settle")
+    before = bet_store.replay(events, settle["v"] - 1)
+    assert len(before["bets"]) == 60 and before["is_locked"]
+    # 换一个进程内的新 Store 读同一个存档，也和重放一致
+    fresh = bet_store.Store(bet_store.open_backend(db_file, kind), new_game)
+    assert bet_store.state_of(bet_store.thaw(fresh.snapshot())) == bet_store.state_of(fresh.replay_events())
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_event_append_failure_marks_gap(tmp_path, kind, monkeypatch):
+    store = bet_store.Store(bet_store.open_backend(str(tmp_path / "game_data.json"), kind), new_game)
+    store.update(lambda d: d["users"].update(甲="x"))
+    assert store.events.complete()
+
+    def broken(events, truncate=False):
+        raise OSError("磁盘满了")
+    monkeypatch.setattr(store.events, "append", broken)
+    # 存档已经提交：update / 下注照常返回，不会被当成保存失败
+    assert store.update(lambda d: d["users"].update(乙="x")) is None
+    assert store.append_bet({"player": "甲", "market": "m", "choice": "a", "amount": 10, "timestamp": 0}) is None
+    assert set(store.snapshot()["users"]) == {"甲", "乙"}
+    assert not store.events.complete()  # 少了提交，不能再拿来恢复存档
+    monkeypatch.undo()
+    store.update(lambda d: d.update(is_locked=True))
+    assert not store.events.complete()
+    store.remove()
+    store.snapshot()  # 删档后新开一局，流水重新从开局事件记起
+    assert store.events.complete()
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_search_logs_is_case_sensitive(tmp_path, kind):
+    store = bet_store.Store(bet_store.open_backend(str(tmp_path / "game_data.json"), kind), new_game)
+    store.update(lambda d: d["logs"].extend(["[MVP] 结果: Alice", "mvp 100% 命中", "a_b 赔率 2.00"]))
+    assert store.search_logs("MVP") == [(1, "[MVP] 结果: Alice")]
+    assert store.search_logs("mvp") == [(1, "mvp 100% 命中")]
+    assert [l for _, l in store.search_logs("%")] == ["mvp 100% 命中"]
+    assert [l for _, l in store.search_logs("_")] == ["a_b 赔率 2.00"]
+    assert len(store.search_logs("")) == 3
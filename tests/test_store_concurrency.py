@@ -0,0 +1,76 @@
+"""
+多进程并发写同一个存档：下注 (带复核) 和注册 / 结算类的 update 交错提交，
+最后存档里的注单数、账号数必须和各进程确认成功的次数完全一致。
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROCESSES = 4
+THREADS = 3
+BETS = 25  # 每个线程下注次数
+EVERY = 5  # 每下几注提交一次 update
+
+def new_game():
+    return {"round": 1, "is_locked": False, "users": {}, "vault": {}, "bets": [], "logs": []}
+
+def worker(db_file, pid):
+    """子进程入口：几个线程同时下注 / 注册，打印确认成功的注单数和注册数"""
+    import bet_store
+    store = bet_store.Store(bet_store.open_backend(db_file, bet_store.DEFAULT_BACKEND), new_game)
+    counts = {"bets": 0, "users": 0}
+    guard = threading.Lock()
+
+    def check(d):
+        return "已封盘" if d["is_locked"] else None
+
+    def register(name):
+        def fn(d):
+            d["users"][name] = "x"
+            d["vault"][name] = d["vault"].get(name, 0) + 1
+            d["settled"] = d.get("settled", 0) + 1
+        return fn
+
+    def run(tid):
+        for i in range(BETS):
+            player = f"p{pid}-{tid}"
+            err = store.append_bet({"player": player, "market": "m", "choice": str(i % 3), "amount": 1, "timestamp": 0}, check)
+            if not err:
+                with guard: counts["bets"] += 1
+            if i % EVERY == 0:
+                store.update(register(f"{player}-{i}"))
+                with guard: counts["users"] += 1
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in range(THREADS)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    print(counts["bets"], counts["users"])
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_concurrent_writers_lose_nothing(tmp_path, kind):
+    db_file = str(tmp_path / "game_data.json")
+    env = dict(os.environ, BET_BACKEND=kind, PYTHONPATH=ROOT)
+    code = f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); " \
+           f"import test_store_concurrency as t; t.worker({db_file!r}, int(sys.argv[1]))"
+    procs = [subprocess.Popen([sys.executable, "-c", code, str(p)], env=env, stdout=subprocess.PIPE, text=True)
+             for p in range(PROCESSES)]
+    bets = users = 0
+    for p in procs:
+        out, _ = p.communicate(timeout=300)
+        assert p.returncode == 0
+        b, u = map(int, out.split())
+        bets, users = bets + b, users + u
+
+    import bet_store
+    data = bet_store.open_backend(db_file, kind).load()
+    assert bets == PROCESSES * THREADS * BETS
+    assert len(data["bets"]) == bets
+    assert len(data["users"]) == users
+    assert data["settled"] == users
+    assert data["version"] == bets + users